@@ -5,4 +5,4 @@ poetry run python -m src.prepare_data.prepare_places --input ./data/raw_data.jso
 
 echo ""
 echo "--- Step 2: Calculating travel times from places.json ---"
-poetry run python -m src.prepare_data.fetch_travel_time --input ./data/places.json --output ./data/travel_times.json
\ No newline at end of file
+poetry run python -m src.prepare_data.fetch_travel_time --input ./data/places.json --output ./data/travel_times.json --cache ./data/travel_cache.sqlite
\ No newline at end of file
@@ -4,37 +4,84 @@ Plot pheromone strength over iterations on a map with a slider.
 Displays all markets and visualizes pheromone trails between them.
 """
 
-import json
 import sys
 from pathlib import Path
 
+import numpy as np
+import orjson
 import plotly.graph_objects as go
 
+# Edge strength bins (name, line width, color): weaker trails thin and faded, stronger ones thick and opaque.
+# Width/opacity follow 1 + 5*s and 0.3 + 0.7*s at the bin centers of the normalized strength s.
+EDGE_BIN_BOUNDS = [0.25, 0.5, 0.75]
+EDGE_BINS = [
+    ("Weak trails", 1.6, 'rgba(0, 100, 200, 0.39)'),
+    ("Moderate trails", 2.9, 'rgba(0, 100, 200, 0.56)'),
+    ("Strong trails", 4.1, 'rgba(0, 100, 200, 0.74)'),
+    ("Very strong trails", 5.4, 'rgba(0, 100, 200, 0.91)'),
+]
+
+# Animation options shared by every slider step
+SLIDER_STEP_OPTS = {
+    "frame": {"duration": 300, "redraw": True},
+    "mode": "immediate",
+    "transition": {"duration": 300}
+}
+
 
 def load_pheromone_data(pheromone_file):
     """Load pheromone matrices from JSON file."""
-    with open(pheromone_file, 'r') as f:
-        data = json.load(f)
-    return data
+    return orjson.loads(Path(pheromone_file).read_bytes())
 
 
 def load_markets(places_file):
     """Load market data from places.json file."""
-    with open(places_file, 'r') as f:
-        markets_raw = json.load(f)
+    markets_raw = orjson.loads(Path(places_file).read_bytes())
     
     # Markets use string keys (for compatibility)
     markets = {str(m["id"]): m for m in markets_raw}
     return markets
 
 
-def create_pheromone_plot(pheromone_file, places_file):
+def parse_pheromone_matrix(matrix):
+    """
+    Split a serialized pheromone matrix ({"from_to": strength}) into parallel arrays.
+    Self-loops (from == to) are dropped here since they are never drawn.
+    
+    Returns:
+        from_idx, to_idx, strength as NumPy arrays
+    """
+    # np.char.partition cannot handle an empty key array: an iteration without edges plots nothing
+    if not matrix:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32), np.empty(0)
+    
+    keys = np.array(list(matrix.keys()))
+    split = np.char.partition(keys, '_')
+    from_idx = split[:, 0].astype(np.int32)
+    to_idx = split[:, 2].astype(np.int32)
+    strength = np.fromiter(matrix.values(), dtype=np.float64, count=len(matrix))
+    nondiag = from_idx != to_idx
+    return from_idx[nondiag], to_idx[nondiag], strength[nondiag]
+
+
+def line_segments(start, end):
+    """Interleave segment start/end values with None separators for a single Plotly line trace."""
+    segments = np.empty((len(start), 3), dtype=object)
+    segments[:, 0] = start
+    segments[:, 1] = end
+    segments[:, 2] = None
+    return segments.ravel().tolist()
+
+
+def create_pheromone_plot(pheromone_file, places_file, max_frames=50):
     """
     Create an interactive plot showing pheromone strength over iterations.
     
     Args:
         pheromone_file: Path to pheromone_matrices_day1.json
         places_file: Path to places.json
+        max_frames: Maximum number of iterations shown on the slider; longer runs are
+            evenly subsampled (first and last iteration are always kept). None shows all.
     """
     # Load data
     pheromone_data = load_pheromone_data(pheromone_file)
@@ -44,25 +91,22 @@ def create_pheromone_plot(pheromone_file, places_file):
     index_to_market = {int(k): int(v) for k, v in pheromone_data["index_to_market"].items()}
     iterations = pheromone_data["iterations"]
     
-    # Prepare market positions
-    market_positions = {}
+    # Plotly sliders get sluggish with many frames, so subsample long runs evenly
+    if max_frames and len(iterations) > max_frames:
+        keep = np.unique(np.linspace(0, len(iterations) - 1, max_frames).round().astype(int))
+        iterations = [iterations[i] for i in keep]
+    
+    # Collect market ids, positions and names in a single pass
+    market_ids, market_lats, market_lons, market_names = [], [], [], []
     for market_id_str, market in markets.items():
-        market_id = int(market_id_str)
-        market_positions[market_id] = {
-            "lat": market["latitude"],
-            "lon": market["longitude"],
-            "name": market["Name"]
-        }
+        market_ids.append(int(market_id_str))
+        market_lats.append(market["latitude"])
+        market_lons.append(market["longitude"])
+        market_names.append(market["Name"])
     
     # Create figure
     fig = go.Figure()
     
-    # Add all markets as markers (visible in all frames)
-    market_ids = list(market_positions.keys())
-    market_lats = [market_positions[mid]["lat"] for mid in market_ids]
-    market_lons = [market_positions[mid]["lon"] for mid in market_ids]
-    market_names = [market_positions[mid]["name"] for mid in market_ids]
-    
     # Add market markers
     fig.add_trace(go.Scattermap(
         lat=market_lats,
@@ -82,104 +126,88 @@ def create_pheromone_plot(pheromone_file, places_file):
     # Prepare frames for each iteration
     frames = []
     
-    # Calculate global min/max for consistent scaling
-    all_strengths = []
+    # Parse all matrices into index/strength arrays once, releasing each
+    # matrix dict as soon as it is converted (the dicts dominate memory)
+    parsed_iterations = []
     for iter_data in iterations:
-        all_strengths.extend(iter_data["matrix"].values())
-    global_min_strength = min(all_strengths) if all_strengths else 0.95
-    global_max_strength = max(all_strengths) if all_strengths else 1.0
+        parsed_iterations.append((iter_data["iteration"], *parse_pheromone_matrix(iter_data.pop("matrix"))))
+    del pheromone_data, iterations
+    
+    # Calculate global min/max for consistent scaling
+    global_min_strength, global_max_strength = np.inf, -np.inf
+    for _, _, _, strength in parsed_iterations:
+        if strength.size:
+            global_min_strength = min(global_min_strength, float(strength.min()))
+            global_max_strength = max(global_max_strength, float(strength.max()))
+    if global_min_strength > global_max_strength:
+        global_min_strength, global_max_strength = 0.95, 1.0
     
     print(f"Pheromone strength range: {global_min_strength:.2f} - {global_max_strength:.2f}")
     
+    # Lookup tables: matrix index -> market id (0 = unknown) and market id -> position
+    max_idx = max([max(index_to_market, default=0)] + [int(max(f.max(), t.max())) for _, f, t, _ in parsed_iterations if len(f)])
+    known_markets = set(market_ids)
+    index_lut = np.zeros(max_idx + 1, dtype=np.int32)
+    for idx, market_id in index_to_market.items():
+        if market_id in known_markets:
+            index_lut[idx] = market_id
+    max_market_id = max(market_ids, default=0)
+    lat_lut = np.full(max_market_id + 1, np.nan)
+    lon_lut = np.full(max_market_id + 1, np.nan)
+    lat_lut[market_ids] = market_lats
+    lon_lut[market_ids] = market_lons
+    
+    # Show edges with strength above initial value (0.95) or top 20% strongest
+    # This ensures we see the pheromone trails that have been reinforced
+    threshold = max(global_min_strength, global_min_strength + (global_max_strength - global_min_strength) * 0.1)
+    inv_range = 1.0 / (global_max_strength - global_min_strength + 1e-6)
+    
     # Process each iteration
-    for iter_data in iterations:
-        iteration = iter_data["iteration"]
-        matrix = iter_data["matrix"]
-        
-        # Collect edges with pheromone strength
-        edges = []
-        for key, strength in matrix.items():
-            from_idx, to_idx = map(int, key.split('_'))
-            from_market = index_to_market.get(from_idx)
-            to_market = index_to_market.get(to_idx)
-            
-            # Skip self-loops
-            if from_market == to_market:
-                continue
-                
-            if from_market and to_market and from_market in market_positions and to_market in market_positions:
-                edges.append({
-                    "from": from_market,
-                    "to": to_market,
-                    "strength": strength
-                })
+    for iteration, from_idx, to_idx, strength in parsed_iterations:
+        from_market = index_lut[from_idx]
+        to_market = index_lut[to_idx]
         
-        # Create traces for edges in this iteration
-        edge_traces = []
+        # Keep edges between known markets above the threshold (self-loops are dropped at parse time)
+        mask = (from_market != 0) & (to_market != 0) & (strength >= threshold)
+        from_market = from_market[mask]
+        to_market = to_market[mask]
+        strength = strength[mask]
+        edges_shown = int(mask.sum())
         
-        # Show edges with strength above initial value (0.95) or top 20% strongest
-        # This ensures we see the pheromone trails that have been reinforced
-        threshold = max(global_min_strength, global_min_strength + (global_max_strength - global_min_strength) * 0.1)
+        # Normalize strength using global range to pick the bin (thin/faded vs. thick/opaque)
+        normalized_strength = (strength - global_min_strength) * inv_range
+        bin_indices = np.digitize(normalized_strength, EDGE_BIN_BOUNDS)
         
-        edges_shown = 0
-        for edge in edges:
-            if edge["strength"] >= threshold:
-                from_pos = market_positions[edge["from"]]
-                to_pos = market_positions[edge["to"]]
-                
-                # Normalize strength for line width (1 to 6) using global range
-                normalized_strength = (edge["strength"] - global_min_strength) / (global_max_strength - global_min_strength + 1e-6)
-                # Make lines clearly visible
-                line_width = 1.0 + normalized_strength * 5.0
-                # Opacity based on strength - stronger = more opaque
-                opacity = 0.3 + normalized_strength * 0.7
-                
-                edge_traces.append(go.Scattermap(
-                    lat=[from_pos["lat"], to_pos["lat"]],
-                    lon=[from_pos["lon"], to_pos["lon"]],
-                    mode='lines',
-                    line=dict(
-                        width=line_width,
-                        color=f'rgba(0, 100, 200, {opacity})'
-                    ),
-                    showlegend=False,
-                    hoverinfo='text',
-                    text=f"Strength: {edge['strength']:.2f}",
-                    name=f"Edge {edge['from']}-{edge['to']}"
-                ))
-                edges_shown += 1
+        # Collapse all edges of this iteration into one line trace per strength bin.
+        # Segments are separated by None so a single trace can draw many disjoint lines.
+        edge_traces = []
+        for bin_idx, (name, width, color) in enumerate(EDGE_BINS):
+            in_bin = bin_indices == bin_idx
+            hover = np.char.mod("Strength: %.2f", strength[in_bin])
+            edge_traces.append(go.Scattermap(
+                lat=line_segments(lat_lut[from_market[in_bin]], lat_lut[to_market[in_bin]]),
+                lon=line_segments(lon_lut[from_market[in_bin]], lon_lut[to_market[in_bin]]),
+                mode='lines',
+                line=dict(width=width, color=color),
+                showlegend=False,
+                hoverinfo='text',
+                text=line_segments(hover, hover),
+                name=name
+            ))
         
         print(f"Iteration {iteration}: Showing {edges_shown} edges (threshold: {threshold:.2f})")
         
-        # Create frame with market markers (trace 0) + edge traces
-        # Need to copy the market marker trace for each frame
-        market_trace = go.Scattermap(
-            lat=market_lats,
-            lon=market_lons,
-            mode='markers+text',
-            marker=dict(
-                size=10,
-                color='red',
-                symbol='circle'
-            ),
-            text=market_names,
-            textposition="top center",
-            name="Markets",
-            showlegend=False
-        )
-        
-        frame_data = [market_trace] + edge_traces
+        # Frames only carry the edge traces; the static market markers (trace 0) are never re-sent
         frames.append(go.Frame(
-            data=frame_data,
+            data=edge_traces,
+            traces=list(range(1, 1 + len(edge_traces))),
             name=str(iteration)
         ))
     
     # Add initial edges from first iteration so something is visible from the start
-    if frames and len(frames) > 0:
-        first_frame = frames[0]
-        # Add all edge traces from first frame to initial figure
-        # This ensures edges are visible when the plot first loads
-        for trace in first_frame.data[1:]:  # Skip market marker (index 0), add all edges
+    # (must match the frame arity, i.e. traces 1..len(EDGE_BINS))
+    if frames:
+        for trace in frames[0].data:
             fig.add_trace(trace)
     
     # Add frames to figure (must be after adding initial traces)
@@ -244,11 +272,7 @@ def create_pheromone_plot(pheromone_file, places_file):
             "y": 0,
             "steps": [
                 {
-                    "args": [[f.name], {
-                        "frame": {"duration": 300, "redraw": True},
-                        "mode": "immediate",
-                        "transition": {"duration": 300}
-                    }],
+                    "args": [[f.name], SLIDER_STEP_OPTS],
                     "label": f"Iteration {f.name}",
                     "method": "animate"
                 }
@@ -1,5 +1,6 @@
 from .ant_agent import AntAgent
+from .colony import run_aco_numpy
 from .coordinator_agent import CoordinatorAgent
 from .pheromone_manager_agent import PheromoneManagerAgent
 
-__all__ = ['AntAgent', 'CoordinatorAgent', 'PheromoneManagerAgent']
+__all__ = ['AntAgent', 'CoordinatorAgent', 'PheromoneManagerAgent', 'run_aco_numpy']
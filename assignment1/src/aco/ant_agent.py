@@ -1,7 +1,7 @@
 import random
 import numpy as np
-import json
-import uuid
+import orjson
+import itertools
 import asyncio
 from spade.agent import Agent
 from spade.behaviour import CyclicBehaviour
@@ -9,18 +9,28 @@ from spade.message import Message
 from spade.template import Template
 
 
+def _dumps(obj):
+    """Serialize a message body (SPADE bodies must be str)."""
+    return orjson.dumps(obj).decode()
+
+
 class AntAgent(Agent):
     """
     An ACO ant agent that constructs paths to maximize markets visited.
+    
+    If pheromone_manager is given (a PheromoneManagerAgent in the same process), pheromone
+    queries and tour deposits call it directly instead of going through XMPP messages.
     """
     
     def __init__(self, jid, password, ant_id, markets, travel_times, 
-                 manager_jid, coordinator_jid=None, service_time=30, alpha=1.0, beta=2.0):
+                 manager_jid, coordinator_jid=None, service_time=30, alpha=1.0, beta=2.0,
+                 pheromone_manager=None):
         super().__init__(jid, password)
         self.ant_id = ant_id
         self.markets = markets
         self.travel_times = travel_times
         self.manager_jid = manager_jid
+        self.pheromone_manager = pheromone_manager
         self.coordinator_jid = coordinator_jid or "coordinator@localhost"
         self.service_time = service_time
         
@@ -30,6 +40,60 @@ class AntAgent(Agent):
         self.current_tour = []
         self.current_time = 0
         self.current_location = None
+        
+        # Correlation IDs only need to be unique per ant
+        self._corr_counter = itertools.count()
+        
+        # Market ids are fixed for the lifetime of the agent
+        self._all_locations = [int(key) for key in markets.keys()]
+        
+        # Dense arrays indexed directly by market id for vectorized candidate scoring
+        size = max(max(self._all_locations) + 1, len(travel_times))
+        self._opens = np.zeros(size)
+        self._closes = np.zeros(size)
+        for market_id in self._all_locations:
+            self._opens[market_id] = markets[str(market_id)]["opens_minutes"]
+            self._closes[market_id] = markets[str(market_id)]["closes_minutes"]
+        # Unreachable pairs carry a huge travel time, so they are never feasible
+        self._tt = np.asarray(travel_times, dtype=float)
+        # Heuristic desirability eta**beta of every edge, fixed for the lifetime of the agent
+        self._eta_beta = (1.0 / (self._tt + 1)) ** beta
+        self._unvisited_mask = np.zeros(size, dtype=bool)
+    
+    def start_tour(self):
+        """Reset ant state for a new tour"""
+        # Start at a random market
+        start = random.choice(self._all_locations)
+        
+        self.current_tour = [start]
+        
+        # Always start at the opening time of the first market
+        # (ants arrive exactly when the market opens)
+        arrival_time = self._opens[start]
+        
+        # After service at first market, departure time
+        departure_time = arrival_time + self.service_time
+        self.current_time = departure_time  # Set to departure time for consistency
+        
+        self.current_location = start
+        
+        # All other locations are unvisited
+        self._unvisited_mask[:] = False
+        self._unvisited_mask[self._all_locations] = True
+        self._unvisited_mask[start] = False
+    
+    async def run_tour(self, iteration_id):
+        """
+        Construct a complete tour in one awaitable and hand it to the pheromone manager.
+        
+        Used in local mode, where the coordinator gathers all ants directly instead of
+        signalling them with start_iteration messages and waiting for tour_complete replies.
+        """
+        self.start_tour()
+        while await self.tour_behavior.extend_tour():
+            pass
+        self.pheromone_manager.add_tour(self.current_tour, iteration_id, self.ant_id)
+        return self.current_tour
     
     async def setup(self):
         print(f"[Ant {self.ant_id}] Starting at {self.jid}")
@@ -52,14 +116,15 @@ class AntAgent(Agent):
                 return
             if msg: 
                 try:
-                    data = json.loads(msg.body)
+                    data = orjson.loads(msg.body)
                     iteration_id = data.get("iteration_id")
                     # Update tour construction behavior's iteration via agent reference
                     if hasattr(self.agent, 'tour_behavior') and self.agent.tour_behavior:
                         if iteration_id > self.agent.tour_behavior.current_iteration:
                             self.agent.tour_behavior.current_iteration = iteration_id
                             self.agent.tour_behavior.reset_tour()
-                except (json.JSONDecodeError, KeyError, TypeError):
+                            self.agent.tour_behavior._start_event.set()
+                except (orjson.JSONDecodeError, KeyError, TypeError):
                     # Invalid message, ignore
                     pass
 
@@ -70,158 +135,117 @@ class AntAgent(Agent):
             self.current_iteration = 0
             # Don't start tour automatically - wait for start_iteration signal
             self.tour_complete = True  # Mark as complete so we wait for signal
+            self._start_event = asyncio.Event()  # Set by StartIterationBehavior once a new tour is ready
         
         def reset_tour(self):
             """Reset ant state for a new tour"""
-            # Start at a random market
-            all_locations = [int(key) for key in self.agent.markets.keys()]
-            start = random.choice(all_locations)
-            
-            self.agent.current_tour = [start]
-            
-            # Always start at the opening time of the first market
-            # (ants arrive exactly when the market opens)
-            market = self.agent.markets[str(start)]
-            arrival_time = market["opens_minutes"]
-            
-            # After service at first market, departure time
-            departure_time = arrival_time + self.agent.service_time
-            self.agent.current_time = departure_time  # Set to departure time for consistency
-            
-            self.agent.current_location = start
-            
-            # All other locations are unvisited
-            self.unvisited = set(all_locations)
-            self.unvisited.remove(start)
-            
+            self.agent.start_tour()
             self.tour_complete = False
         
         async def run(self):
-            # If tour is complete, just wait (start_iteration is handled by separate behavior)
+            # If tour is complete, wait for the next start (start_iteration is handled by separate behavior)
             if self.tour_complete:
-                await asyncio.sleep(0.1)  # Small delay to avoid busy waiting
+                await self._start_event.wait()
+                self._start_event.clear()
                 return
             
-            next_location = await self.select_next_market()
-            
-            if next_location is None:
+            if not await self.extend_tour():
                 self.tour_complete = True
                 await self.deposit_tour()
                 # Send tour_complete message to coordinator
                 await self.notify_tour_complete()
-                return
+        
+        async def extend_tour(self):
+            """
+            Move the ant to the next market of its tour.
             
-            # Calculate travel and arrival time
-            travel_time = self.agent.travel_times[
-                self.agent.current_location
-            ][next_location]
+            Returns:
+                False if the tour is complete (no feasible market left)
+            """
+            next_location, arrival_time = await self.select_next_market()
             
-            arrival_time = self.agent.current_time + travel_time
-            market = self.agent.markets[str(next_location)]
-            open_time = market["opens_minutes"]
-            close_time = market["closes_minutes"]
+            if next_location is None:
+                return False
             
-            # Wait if arrive before opening
-            if arrival_time < open_time:
-                arrival_time = open_time
+            close_time = self.agent._closes[next_location]
             
             # Ensure we can complete service before market closes
             departure_time = arrival_time + self.agent.service_time
             if departure_time > close_time:
                 # Can't complete service before closing, skip this market
                 # This shouldn't happen but add safety check
-                self.tour_complete = True
-                await self.deposit_tour()
-                await self.notify_tour_complete()
-                return
+                return False
             
             self.agent.current_tour.append(next_location)
             self.agent.current_time = departure_time
             self.agent.current_location = next_location
-            self.unvisited.remove(next_location)
+            self.agent._unvisited_mask[next_location] = False
+            return True
         
         async def select_next_market(self):
-            if not self.unvisited:
-                return None
+            """
+            Pick the next market by pheromone/heuristic roulette.
             
-            probabilities = {}
-            feasible_cities = []
+            Returns:
+                (market_id, arrival_time) with waiting until opening already applied,
+                or (None, None) if no unvisited market is feasible
+            """
+            agent = self.agent
+            travel_row = agent._tt[agent.current_location]
             
-            for next_city in self.unvisited:
-                travel_time = self.agent.travel_times[
-                    self.agent.current_location
-                ][next_city]
-                # current_time represents departure time from current location
-                # So arrival at next market = departure + travel_time
-                arrival_time = self.agent.current_time + travel_time
-                
-                market = self.agent.markets[str(next_city)]
-                open_time = market["opens_minutes"]
-                close_time = market["closes_minutes"]
-                
-                # Adjust arrival if before opening
-                if arrival_time < open_time:
-                    arrival_time = open_time
-                
-                # Skip if we can't complete service before market closes
-                # Need at least service_time available: arrival + service_time <= close_time
-                departure_time = arrival_time + self.agent.service_time
-                if departure_time > close_time:
-                    continue
-                
-                feasible_cities.append(next_city)
-                
-                pheromone = await self.query_pheromone(
-                    self.agent.current_location,
-                    next_city
-                )
-                
-                distance = self.agent.travel_times[
-                    self.agent.current_location
-                ][next_city]
-                heuristic = 1.0 / (distance + 1)
-                
-                probability = (
-                    (pheromone ** self.agent.alpha) *
-                    (heuristic ** self.agent.beta)
-                )
-                probabilities[next_city] = probability
+            # current_time represents departure time from current location
+            # So arrival at next market = departure + travel_time, waiting if before opening
+            arrival_times = np.maximum(agent.current_time + travel_row, agent._opens)
             
-            if not feasible_cities:
-                return None
+            # Skip markets where we can't complete service before they close
+            feasible = agent._unvisited_mask & (arrival_times + agent.service_time <= agent._closes)
+            feasible_cities = np.flatnonzero(feasible)
             
-            total = sum(probabilities.values())
-            if total == 0:
-                return random.choice(feasible_cities)
+            if len(feasible_cities) == 0:
+                return None, None
             
-            normalized = {
-                city: prob / total 
-                for city, prob in probabilities.items()
-            }
+            # One round-trip to the pheromone manager for the whole row of the current market
+            # (feasible_cities is sorted, so its last entry is the largest id; default 1.0 if the query fails)
+            row = await self.query_pheromone_row(agent.current_location)
+            if row is not None and len(row) > feasible_cities[-1]:
+                pheromones = row[feasible_cities]
+            else:
+                pheromones = np.ones(len(feasible_cities))
+            if agent.alpha != 1.0:
+                pheromones = pheromones ** agent.alpha
             
-            cities_list = list(feasible_cities)
-            probabilities_list = [
-                normalized[city] for city in cities_list
-            ]
+            probabilities = pheromones * agent._eta_beta[agent.current_location, feasible_cities]
             
-            selected = np.random.choice(
-                cities_list,
-                p=probabilities_list
-            )
+            # Roulette-wheel selection via inverse CDF on the unnormalized weights
+            cumulative = np.cumsum(probabilities)
+            total = cumulative[-1]
+            if total == 0:
+                choice = int(random.choice(feasible_cities))
+            else:
+                selected = np.searchsorted(cumulative, np.random.random() * total, side='right')
+                choice = int(feasible_cities[min(selected, len(feasible_cities) - 1)])
             
-            return int(selected)
+            return choice, arrival_times[choice]
         
-        async def query_pheromone(self, from_loc, to_loc):
+        async def query_pheromone_row(self, from_loc):
+            """
+            Query the pheromone levels of all edges leaving from_loc in a single message.
+            
+            Returns:
+                array indexed by destination market id, or None if no valid response arrived
+            """
+            if self.agent.pheromone_manager is not None:
+                return self.agent.pheromone_manager.pheromone_row(from_loc)
+            
             # Generate unique correlation ID for request-response matching
-            correlation_id = str(uuid.uuid4())
+            correlation_id = f"{self.agent.ant_id}-{next(self.agent._corr_counter)}"
             
             query_msg = Message(to=self.agent.manager_jid)
-            query_msg.body = json.dumps({
+            query_msg.body = _dumps({
                 "from": from_loc,
-                "to": to_loc,
                 "correlation_id": correlation_id
             })
-            query_msg.set_metadata("performative", "query_pheromone")
+            query_msg.set_metadata("performative", "query_pheromone_row")
             query_msg.set_metadata("correlation_id", correlation_id)
             
             await self.send(query_msg)
@@ -235,36 +259,39 @@ class AntAgent(Agent):
                 elapsed = asyncio.get_event_loop().time() - start_time
                 remaining = timeout - elapsed
                 if remaining <= 0:
-                    return 1.0
+                    return None
                 
                 response = await self.receive(timeout=min(remaining, 0.1))
                 
                 if response is None:
                     # Timeout reached
-                    return 1.0
+                    return None
                 
                 # Check if this is the response we're waiting for
-                if (response.get_metadata("performative") == "pheromone_response" and
+                if (response.get_metadata("performative") == "pheromone_row_response" and
                     response.get_metadata("correlation_id") == correlation_id):
                     try:
-                        data = json.loads(response.body)
+                        data = orjson.loads(response.body)
                         # Verify correlation ID matches in body too
                         if data.get("correlation_id") == correlation_id:
-                            return data.get("pheromone", 1.0)
+                            return np.array(data["pheromones"], dtype=float)
                         else:
-                            return 1.0
-                    except (json.JSONDecodeError, KeyError):
-                        return 1.0
+                            return None
+                    except (orjson.JSONDecodeError, KeyError, TypeError, ValueError):
+                        return None
                 # Not our message, continue waiting
         
         async def deposit_tour(self):
+            if self.agent.pheromone_manager is not None:
+                self.agent.pheromone_manager.add_tour(self.agent.current_tour, self.current_iteration, self.agent.ant_id)
+                return
             
             msg = Message(to=self.agent.manager_jid)
             
             # All locations in tour are visited markets
             markets_visited = len(self.agent.current_tour)
             
-            msg.body = json.dumps({
+            msg.body = _dumps({
                 "tour": self.agent.current_tour,
                 "num_markets": markets_visited,
                 "iteration_id": self.current_iteration,
@@ -277,7 +304,7 @@ class AntAgent(Agent):
         async def notify_tour_complete(self):
             """Notify coordinator that tour is complete"""
             msg = Message(to=self.agent.coordinator_jid)
-            msg.body = json.dumps({
+            msg.body = _dumps({
                 "ant_id": self.agent.ant_id,
                 "iteration_id": self.current_iteration
             })
@@ -0,0 +1,182 @@
+import numpy as np
+import orjson
+
+
+def build_colony_arrays(markets, travel_times):
+    """
+    Build compact arrays for the colony, indexed by position in market_ids.
+    
+    Returns:
+        market_ids, opens, closes, tt with tt[i][j] the travel time from
+        market_ids[i] to market_ids[j]
+    """
+    market_ids = np.array([int(key) for key in markets.keys()], dtype=np.intp)
+    opens = np.array([markets[key]["opens_minutes"] for key in markets.keys()], dtype=float)
+    closes = np.array([markets[key]["closes_minutes"] for key in markets.keys()], dtype=float)
+    tt = np.asarray(travel_times, dtype=float)[np.ix_(market_ids, market_ids)]
+    return market_ids, opens, closes, tt
+
+
+def construct_tours(num_ants, opens, closes, tt, service_time, weights):
+    """
+    Let num_ants ants build their tours simultaneously.
+    
+    Every ant starts at a random market when it opens and keeps moving to a feasible
+    unvisited market (service completes before closing, waiting if it arrives early),
+    picked by roulette over weights[current, candidate]. A tour ends once no market is
+    feasible anymore.
+    
+    Returns:
+        list of tours as lists of market indices
+    """
+    num_markets = len(opens)
+    ants = np.arange(num_ants)
+    current = np.random.randint(num_markets, size=num_ants)
+    current_time = opens[current] + service_time
+    unvisited = np.ones((num_ants, num_markets), dtype=bool)
+    unvisited[ants, current] = False
+    tours = [[int(start)] for start in current]
+    
+    active = ants
+    while len(active):
+        location = current[active]
+        arrival_times = np.maximum(current_time[active, None] + tt[location], opens)
+        feasible = unvisited[active] & (arrival_times + service_time <= closes)
+        
+        # Ants without a feasible market are done
+        moving = feasible.any(axis=1)
+        active, location, arrival_times, feasible = active[moving], location[moving], arrival_times[moving], feasible[moving]
+        if not len(active):
+            break
+        
+        probabilities = np.where(feasible, weights[location], 0.0)
+        # Fully evaporated trails: pick uniformly among the feasible markets
+        exhausted = probabilities.sum(axis=1) == 0
+        probabilities[exhausted] = feasible[exhausted]
+        
+        # Roulette-wheel selection via inverse CDF on the unnormalized weights, one draw per ant
+        cumulative = np.cumsum(probabilities, axis=1)
+        draws = np.random.random(len(active)) * cumulative[:, -1]
+        # A draw rounding up to the total would step past the last candidate: clamp to each
+        # ant's last feasible market, not the last column, so tours stay feasible and unique
+        last_feasible = num_markets - 1 - np.argmax(feasible[:, ::-1], axis=1)
+        choice = np.minimum((cumulative <= draws[:, None]).sum(axis=1), last_feasible)
+        
+        current[active] = choice
+        current_time[active] = arrival_times[np.arange(len(active)), choice] + service_time
+        unvisited[active, choice] = False
+        for ant, market in zip(active.tolist(), choice.tolist()):
+            tours[ant].append(market)
+    
+    return tours
+
+
+def save_pheromone_history(output_file, day, market_ids, history):
+    """Write the pheromone matrix of every iteration in the PheromoneManagerAgent file format."""
+    market_ids = market_ids.tolist()
+    keys = [f"{from_id}_{to_id}" for from_id in market_ids for to_id in market_ids]
+    all_data = {
+        "day": day,
+        "num_locations": len(market_ids),
+        "markets": {str(market_id): market_id for market_id in market_ids},
+        "market_to_index": {str(market_id): idx + 1 for idx, market_id in enumerate(market_ids)},
+        "index_to_market": {str(idx + 1): market_id for idx, market_id in enumerate(market_ids)},
+        "iterations": [
+            {
+                "iteration": iteration,
+                "matrix": dict(zip(keys, pheromone.ravel().tolist())),
+                "global_best_count": best_count,
+                "global_best_tour": best_tour
+            }
+            for iteration, pheromone, best_count, best_tour in history
+        ]
+    }
+    output_file.write_bytes(orjson.dumps(all_data, option=orjson.OPT_INDENT_2))
+
+
+def run_aco_numpy(markets, travel_times, service_time=30, params=None, output_dir=None, day=1, verbose=True):
+    """
+    Run ant colony optimization for market route optimization in a single process.
+    
+    Same algorithm as the agent based colony (ants, pheromone manager and coordinator
+    exchanging XMPP messages), with all ants of an iteration built in lockstep on arrays.
+    
+    Args:
+        markets: Dictionary of market data
+        travel_times: Travel-time matrix indexed by market id
+        service_time: Service time per market in minutes
+        params: Dictionary of ACO parameters. If None, uses defaults:
+            - num_ants: 20
+            - num_iterations: 5
+            - initial_pheromone: 1.0
+            - decay: 0.5 (fraction of the pheromone kept per iteration)
+            - alpha: 1.0 (pheromone weight)
+            - beta: 4.0 (heuristic weight)
+            - reward_multiplier: 5.0 (pheromone deposit multiplier)
+        output_dir: Directory for the pheromone matrices (None to skip saving them)
+        day: Day number used in the pheromone matrices file name
+        verbose: Whether to print progress
+    
+    Returns:
+        (best_route, best_fitness)
+    """
+    # Default parameters
+    default_params = {
+        "num_ants": 20,
+        "num_iterations": 5,
+        "initial_pheromone": 1.0,
+        "decay": 0.5,
+        "alpha": 1.0,
+        "beta": 4.0,
+        "reward_multiplier": 5.0
+    }
+    
+    # Merge with provided parameters
+    if params is None:
+        params = {}
+    aco_params = {**default_params, **params}
+    
+    if not markets:
+        return [], 0
+    
+    market_ids, opens, closes, tt = build_colony_arrays(markets, travel_times)
+    num_markets = len(market_ids)
+    
+    pheromone = np.full((num_markets, num_markets), aco_params["initial_pheromone"], dtype=float)
+    # Heuristic desirability eta**beta of every edge, fixed for the whole run
+    eta_beta = (1.0 / (tt + 1)) ** aco_params["beta"]
+    
+    best_tour = []
+    best_count = 0
+    history = []
+    
+    for iteration in range(1, aco_params["num_iterations"] + 1):
+        if aco_params["alpha"] != 1.0:
+            weights = pheromone ** aco_params["alpha"] * eta_beta
+        else:
+            weights = pheromone * eta_beta
+        tours = construct_tours(aco_params["num_ants"], opens, closes, tt, service_time, weights)
+        
+        # Evaporation on all edges
+        pheromone *= aco_params["decay"]
+        
+        iteration_best = max(tours, key=len)
+        if len(iteration_best) > best_count:
+            best_tour = iteration_best
+            best_count = len(iteration_best)
+            if verbose:
+                print(f"New global best: {best_count} markets")
+        
+        # Reinforce ONLY the global best solution (elitism)
+        deposit_amount = best_count / num_markets * aco_params["reward_multiplier"]
+        pheromone[best_tour[:-1], best_tour[1:]] += deposit_amount
+        
+        if verbose:
+            print(f"Iteration {iteration}: best {len(iteration_best)} markets, global best {best_count} markets")
+        if output_dir:
+            history.append((iteration, pheromone.copy(), best_count, market_ids[best_tour].tolist()))
+    
+    if output_dir:
+        save_pheromone_history(output_dir / f"pheromone_matrices_day{day}.json", day, market_ids, history)
+    
+    return market_ids[best_tour].tolist(), best_count
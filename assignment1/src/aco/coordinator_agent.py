@@ -1,29 +1,44 @@
 import asyncio
-import json
+import orjson
 from spade.agent import Agent
-from spade.behaviour import PeriodicBehaviour, CyclicBehaviour
+from spade.behaviour import CyclicBehaviour
 from spade.message import Message
 from spade.template import Template
 
 
+def _dumps(obj):
+    """Serialize a message body (SPADE bodies must be str)."""
+    return orjson.dumps(obj).decode()
+
+
 class CoordinatorAgent(Agent):
     """
     Coordinator that manages the overall ACO algorithm.
+    
+    If pheromone_manager is given (a PheromoneManagerAgent in the same process), the
+    end-of-iteration update and best solution query call it directly instead of messaging it.
+    Likewise, if ants (AntAgents in the same process) are given, each iteration runs their
+    tours with asyncio.gather instead of start_iteration/tour_complete messages.
     """
     
     def __init__(self, jid, password, pheromone_manager_jid, ant_jids,
-                 num_iterations=100):
+                 num_iterations=100, pheromone_manager=None, ants=None):
         super().__init__(jid, password)
         self.pheromone_manager_jid = pheromone_manager_jid
+        self.pheromone_manager = pheromone_manager
+        self.ants = ants
         self.ant_jids = ant_jids
         self.num_iterations = num_iterations
         self.iteration = 0
         self.best_solution = None
         self.completed_ants = set()  # Track which ants have completed their tours
+        self.iteration_done = asyncio.Event()  # Set once every ant completed the current iteration
+        self.finished = asyncio.Event()  # Set once the last iteration is done, so callers need not poll is_alive()
     
     async def setup(self):
         print(f"[Coordinator] Starting ACO algorithm")
-        self.add_behaviour(self.CoordinationBehavior(period=5))
+        # Iterations run back to back: each one waits for its ants, not for a fixed period
+        self.add_behaviour(self.CoordinationBehavior())
         
         # Separate behavior to handle tour_complete messages
         template = Template()
@@ -39,7 +54,7 @@ class CoordinatorAgent(Agent):
                 return
             if msg:
                 try:
-                    data = json.loads(msg.body)
+                    data = orjson.loads(msg.body)
                     ant_id = data.get("ant_id")
                     iteration_id = data.get("iteration_id")
                     
@@ -48,25 +63,53 @@ class CoordinatorAgent(Agent):
                         if ant_id not in self.agent.completed_ants:
                             self.agent.completed_ants.add(ant_id)
                             print(f"[Coordinator] Ant {ant_id} completed tour for iteration {iteration_id}")
-                except (json.JSONDecodeError, KeyError):
+                            if len(self.agent.completed_ants) >= len(self.agent.ant_jids):
+                                self.agent.iteration_done.set()
+                except (orjson.JSONDecodeError, KeyError):
                     # Invalid message, ignore
                     pass
     
-    class CoordinationBehavior(PeriodicBehaviour):
+    class CoordinationBehavior(CyclicBehaviour):
         
         async def run(self):
             self.agent.iteration += 1
             
             print(f"\n=== ACO Iteration {self.agent.iteration} ===")
             
+            if self.agent.ants is not None:
+                # Same process: the iteration is done once every ant's tour is
+                await asyncio.gather(*(ant.run_tour(self.agent.iteration) for ant in self.agent.ants))
+                print(f"[Coordinator] All {len(self.agent.ants)} ants completed their tours")
+            else:
+                await self.run_ants()
+            
+            if self.agent.pheromone_manager is not None:
+                # Same process: update and read the best solution directly
+                iteration_id = self.agent.pheromone_manager.end_iteration(self.agent.iteration)
+                print(f"[Coordinator] Pheromone update confirmed for iteration {iteration_id}")
+                self.agent.best_solution = self.agent.pheromone_manager.best_solution()
+                print(f"[Coordinator] Best solution: {self.agent.best_solution['best_count']} markets visited")
+            else:
+                await self.update_pheromones()
+                await self.query_best_solution()
+            
+            if self.agent.iteration >= self.agent.num_iterations:
+                print("\n=== ACO Complete ===")
+                print("Max iterations reached - stopping ACO")
+                self.agent.finished.set()
+                await self.agent.stop()
+        
+        async def run_ants(self):
+            """Signal all ants to start the iteration and wait until they report their tours complete"""
             # Reset completion tracking for new iteration
             self.agent.completed_ants = set()
+            self.agent.iteration_done.clear()
             
             # Signal all ants to start new iteration with iteration ID
             for ant_jid in self.agent.ant_jids:
                 msg = Message(to=ant_jid)
                 msg.set_metadata("performative", "start_iteration")
-                msg.body = json.dumps({
+                msg.body = _dumps({
                     "iteration_id": self.agent.iteration
                 })
                 await self.send(msg)
@@ -74,22 +117,24 @@ class CoordinatorAgent(Agent):
             # Wait for all ants to finish their tours (explicit completion tracking)
             print(f"[Coordinator] Waiting for {len(self.agent.ant_jids)} ants to complete...")
             max_wait_time = 30  # Maximum wait time in seconds
-            wait_interval = 0.5  # Check every 0.5 seconds
-            elapsed_time = 0
             
-            while len(self.agent.completed_ants) < len(self.agent.ant_jids) and elapsed_time < max_wait_time:
-                await asyncio.sleep(wait_interval)
-                elapsed_time += wait_interval
+            # TourCompleteBehavior sets the event as soon as the last ant reports in
+            try:
+                await asyncio.wait_for(self.agent.iteration_done.wait(), timeout=max_wait_time)
+            except asyncio.TimeoutError:
+                pass
             
             if len(self.agent.completed_ants) < len(self.agent.ant_jids):
                 print(f"[Coordinator] Warning: Only {len(self.agent.completed_ants)}/{len(self.agent.ant_jids)} ants completed within timeout")
             else:
                 print(f"[Coordinator] All {len(self.agent.completed_ants)} ants completed their tours")
-            
+        
+        async def update_pheromones(self):
+            """Ask the pheromone manager to apply the iteration update and wait for its acknowledgment"""
             # Signal pheromone manager to update pheromones with iteration ID
             msg = Message(to=self.agent.pheromone_manager_jid)
             msg.set_metadata("performative", "end_iteration")
-            msg.body = json.dumps({
+            msg.body = _dumps({
                 "iteration_id": self.agent.iteration
             })
             await self.send(msg)
@@ -106,26 +151,28 @@ class CoordinatorAgent(Agent):
                 if remaining <= 0:
                     break
                 
-                msg = await self.receive(timeout=min(remaining, 0.1))
+                msg = await self.receive(timeout=remaining)
                 if msg and msg.get_metadata("performative") == "iteration_updated":
                     response = msg
                     break
             
             if response:
                 try:
-                    data = json.loads(response.body)
+                    data = orjson.loads(response.body)
                     iteration_id = data.get("iteration_id")
                     if iteration_id == self.agent.iteration:
                         print(f"[Coordinator] Pheromone update confirmed for iteration {iteration_id}")
-                except (json.JSONDecodeError, KeyError):
+                except (orjson.JSONDecodeError, KeyError):
                     print("[Coordinator] Warning: Received iteration_updated but couldn't parse iteration_id")
             else:
                 print("[Coordinator] Warning: No iteration_updated acknowledgment received")
-            
+        
+        async def query_best_solution(self):
+            """Fetch the best solution found so far from the pheromone manager"""
             # Query best solution from pheromone manager
             msg = Message(to=self.agent.pheromone_manager_jid)
             msg.set_metadata("performative", "get_best_solution")
-            msg.body = json.dumps({
+            msg.body = _dumps({
                 "iteration_id": self.agent.iteration
             })
             await self.send(msg)
@@ -141,22 +188,17 @@ class CoordinatorAgent(Agent):
                 if remaining <= 0:
                     break
                 
-                msg = await self.receive(timeout=min(remaining, 0.1))
+                msg = await self.receive(timeout=remaining)
                 if msg and msg.get_metadata("performative") == "best_solution_response":
                     response = msg
                     break
             
             if response:
                 try:
-                    data = json.loads(response.body)
+                    data = orjson.loads(response.body)
                     num_visited = data.get("best_count", 0)
                     self.agent.best_solution = data
                     print(f"[Coordinator] Best solution: {num_visited} markets visited")
-                except (json.JSONDecodeError, KeyError):
+                except (orjson.JSONDecodeError, KeyError):
                     print("[Coordinator] Warning: Could not parse best solution response")
-            
-            if self.agent.iteration >= self.agent.num_iterations:
-                print("\n=== ACO Complete ===")
-                print("Max iterations reached - stopping ACO")
-                await self.agent.stop()
 
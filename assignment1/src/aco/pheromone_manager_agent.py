@@ -3,9 +3,15 @@ import json
 from pathlib import Path
 from typing import Optional
 
+import numpy as np
+import orjson
 from spade.agent import Agent
 from spade.behaviour import CyclicBehaviour
-from spade.template import Template
+
+
+def _dumps(obj):
+    """Serialize a message body (SPADE bodies must be str); NumPy arrays are encoded natively."""
+    return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
 
 
 class PheromoneManagerAgent(Agent):
@@ -31,31 +37,128 @@ class PheromoneManagerAgent(Agent):
         # Reverse mapping: index (1-based) to market_id
         self.index_to_market = {idx: market_id for market_id, idx in self.market_to_index.items()}
         
-        self.pheromone = {}
-        for i in range(1, num_locations + 1):
-            self.pheromone[i] = {}
-            for j in range(1, num_locations + 1):
-                self.pheromone[i][j] = initial_pheromone
+        # Dense matrix indexed by (1-based) matrix index; row/column 0 is unused
+        self.pheromone = np.full((num_locations + 1, num_locations + 1), initial_pheromone, dtype=np.float64)
+        # "from_to" market id keys in row-major order of pheromone[1:, 1:], built once for serialization
+        market_ids = [self.index_to_market[idx] for idx in range(1, num_locations + 1)]
+        self._matrix_keys = [f"{from_id}_{to_id}" for from_id in market_ids for to_id in market_ids]
+        # Market id of every matrix index (1..N), to scatter a matrix row into a row indexed by market id
+        self._index_market_ids = np.array(market_ids, dtype=np.intp)
+        self._row_length = max(market_ids, default=0) + 1
+        # Inverse of _index_market_ids: matrix index of every market id, to map whole tours at once
+        self._market_index_lut = np.zeros(self._row_length, dtype=np.intp)
+        self._market_index_lut[self._index_market_ids] = np.arange(1, num_locations + 1)
         
-        self.best_solutions = []
+        self.current_best = None  # Best solution so far with the iteration it was found in
         self.iteration = 0
         self.iteration_tours = []  # Collect tours from all ants in iteration
         self.global_best_tour = None
         self.global_best_count = 0
         self.pheromone_history = []  # Store pheromone matrices for each iteration
     
+    def pheromone_row(self, from_market_id):
+        """
+        Pheromone levels of all edges leaving from_market_id, as an array indexed by
+        destination market id. Markets not in the mapping get the default pheromone value.
+        """
+        row = np.ones(self._row_length)
+        from_loc = self.market_to_index.get(from_market_id)
+        if from_loc is None:
+            print(f"Market ID not in mapping: {from_market_id}")
+        else:
+            row[self._index_market_ids] = self.pheromone[from_loc, 1:]
+        return row
+    
+    def add_tour(self, tour, iteration_id, ant_id=None):
+        """Collect a finished tour; pheromones are only updated once the iteration ends."""
+        # Store tour with its iteration_id (will be filtered during update)
+        self.iteration_tours.append({
+            "tour": tour,
+            "count": len(tour),
+            "ant_id": ant_id,
+            "iteration_id": iteration_id
+        })
+    
+    def end_iteration(self, iteration_id):
+        """
+        Evaporate all trails, reinforce the global best tour with the tours of
+        iteration_id and save the resulting matrix.
+        
+        Returns:
+            the iteration the update was applied to
+        """
+        # Update iteration if provided (same or older iteration: just process current state)
+        if iteration_id > self.iteration:
+            self.iteration = iteration_id
+        
+        # Apply evaporation to all edges
+        self.pheromone *= self.decay_coefficient
+        
+        # Filter tours for this iteration
+        iteration_tours = [
+            tour for tour in self.iteration_tours
+            if tour.get("iteration_id") == self.iteration
+        ]
+        
+        # Find best tour from this iteration
+        if iteration_tours:
+            iteration_best = max(
+                iteration_tours,
+                key=lambda x: x["count"]
+            )
+            
+            # Update global best
+            if iteration_best["count"] > self.global_best_count:
+                self.global_best_tour = iteration_best["tour"]
+                self.global_best_count = iteration_best["count"]
+                self.current_best = {
+                    "tour": iteration_best["tour"],
+                    "count": iteration_best["count"],
+                    "iteration": self.iteration
+                }
+                print(f"New global best: {iteration_best['count']} markets")
+            
+            # Reinforce ONLY the global best solution (elitism)
+            if self.global_best_tour:
+                reward = self.global_best_count / self.num_locations
+                deposit_amount = reward * self.reward_multiplier
+                
+                # map market ids to indices in the pheromone matrix and update all tour edges at once
+                # (a tour never repeats a market, so no edge appears twice)
+                tour_idx = self._market_index_lut[self.global_best_tour]
+                self.pheromone[tour_idx[:-1], tour_idx[1:]] += deposit_amount
+        
+        # Clear tours for the iteration we just processed (to avoid accumulation)
+        self.iteration_tours = [
+            tour for tour in self.iteration_tours
+            if tour.get("iteration_id") != self.iteration
+        ]
+        
+        # Save pheromone matrix for this iteration
+        self.save_pheromone_matrix()
+        return self.iteration
+    
+    def best_solution(self):
+        """Best solution found so far, as reported to the coordinator."""
+        if self.current_best is not None:
+            best = self.current_best
+            return {
+                "best_count": best["count"],
+                "best_tour": best["tour"],
+                "iteration": best["iteration"]
+            }
+        return {
+            "best_count": self.global_best_count,
+            "best_tour": self.global_best_tour if self.global_best_tour else [],
+            "iteration": self.iteration
+        }
+    
     def serialize_pheromone_matrix(self):
         """
         Serialize pheromone matrix to a format suitable for plotting.
         Returns a dictionary mapping (from_market_id, to_market_id) -> pheromone_value
         """
-        matrix = {}
-        for from_idx in range(1, self.num_locations + 1):
-            from_market_id = self.index_to_market[from_idx]
-            for to_idx in range(1, self.num_locations + 1):
-                to_market_id = self.index_to_market[to_idx]
-                matrix[f"{from_market_id}_{to_market_id}"] = self.pheromone[from_idx][to_idx]
-        return matrix
+        return dict(zip(self._matrix_keys, self.pheromone[1:, 1:].ravel().tolist()))
     
     def save_pheromone_matrix(self):
         """Save current pheromone matrix to history and optionally to file"""
@@ -106,202 +209,93 @@ class PheromoneManagerAgent(Agent):
     async def setup(self):
         print(f"[PheromoneManager] Starting at {self.jid}")
         
-        # Behavior 1: Handle pheromone queries from ants
-        template = Template()
-        template.set_metadata("performative", "query_pheromone")
-        behav = self.PheromoneQueryBehavior()
-        self.add_behaviour(behav, template)
+        # A single behaviour receives every message and dispatches it on its performative
+        self.add_behaviour(self.MessageRouterBehavior())
+    
+    class MessageRouterBehavior(CyclicBehaviour):
+        """Dispatches ant queries/deposits and coordinator requests to their handlers"""
         
-        # Behavior 2: Handle pheromone deposits from ants
-        deposit_template = Template()
-        deposit_template.set_metadata("performative", "deposit_pheromone")
-        deposit_behav = self.PheromoneDepositBehavior()
-        self.add_behaviour(deposit_behav, deposit_template)
+        # Seconds to wait for the next message; the manager only wakes up when one arrives
+        IDLE_TIMEOUT = 60
         
-        # Behavior 3: Handle best solution queries from coordinator
-        best_solution_template = Template()
-        best_solution_template.set_metadata("performative", "get_best_solution")
-        best_solution_behav = self.BestSolutionBehavior()
-        self.add_behaviour(best_solution_behav, best_solution_template)
+        async def on_start(self):
+            self.handlers = {
+                "query_pheromone_row": self.handle_row_query,
+                "deposit_pheromone": self.handle_deposit,
+                "end_iteration": self.handle_end_iteration,
+                "get_best_solution": self.handle_best_solution,
+            }
         
-        # Behavior 4: Handle iteration end and update pheromones
-        update_template = Template()
-        update_template.set_metadata("performative", "end_iteration")
-        update_behav = self.IterationUpdateBehavior()
-        self.add_behaviour(update_behav, update_template)
-    
-    class PheromoneQueryBehavior(CyclicBehaviour):
-        """Responds to pheromone level queries from ants"""
-        async def run(self):
-            try:
-                msg = await self.receive(timeout=5)
-            except asyncio.CancelledError:
-                return
-            if msg:
-                try:
-                    data = json.loads(msg.body)
-                    from_market_id = data["from"]
-                    to_market_id = data["to"]
-                    correlation_id = data.get("correlation_id")
-                    
-                    # Map market IDs to indices in the pheromone matrix
-                    try:
-                        from_loc = self.agent.market_to_index[from_market_id]
-                        to_loc = self.agent.market_to_index[to_market_id]
-                        
-                        pheromone_level = self.agent.pheromone.get(
-                            from_loc, {}
-                        ).get(to_loc, 1.0)
-                    except KeyError:
-                        # If market ID not in mapping, return default pheromone value
-                        print(f"Market ID not in mapping: {from_market_id} -> {to_market_id}")
-                        pheromone_level = 1.0
-                    
-                    response = msg.make_reply()
-                    response.body = json.dumps({
-                        "from": from_market_id,
-                        "to": to_market_id,
-                        "pheromone": pheromone_level,
-                        "correlation_id": correlation_id
-                    })
-                    response.set_metadata("performative", "pheromone_response")
-                    if correlation_id:
-                        response.set_metadata("correlation_id", correlation_id)
-                    
-                    await self.send(response)
-                except (json.JSONDecodeError, KeyError) as e:
-                    # Invalid message, ignore
-                    print(f"Invalid pheromone query message: {e}")
-    
-    class PheromoneDepositBehavior(CyclicBehaviour):
-        """Collects tour submissions from ants (no immediate update)"""
         async def run(self):
             try:
-                msg = await self.receive(timeout=5)
+                msg = await self.receive(timeout=self.IDLE_TIMEOUT)
             except asyncio.CancelledError:
                 return
             if msg:
-                try:
-                    data = json.loads(msg.body)
-                    tour = data["tour"]
-                    iteration_id = data.get("iteration_id", self.agent.iteration)
-                    ant_id = data.get("ant_id")
-                    num_visited = len(tour)
-                    
-                    # Store tour with its iteration_id (will be filtered during update)
-                    self.agent.iteration_tours.append({
-                        "tour": tour,
-                        "count": num_visited,
-                        "ant_id": ant_id,
-                        "iteration_id": iteration_id
-                    })
-                except (json.JSONDecodeError, KeyError) as e:
-                    # Invalid message, ignore
-                    print(f"Invalid tour deposit message: {e}")
-    
-    class IterationUpdateBehavior(CyclicBehaviour):
-        """Updates pheromones after all ants complete iteration"""
-        async def run(self):
+                handler = self.handlers.get(msg.get_metadata("performative"))
+                if handler is not None:
+                    await handler(msg)
+        
+        async def handle_row_query(self, msg):
+            """Responds to pheromone row queries (all edges leaving one market, one message per ant step)"""
             try:
-                msg = await self.receive(timeout=10)
-            except asyncio.CancelledError:
-                return
-            if msg:
-                try:
-                    data = json.loads(msg.body)
-                    iteration_id = data.get("iteration_id", self.agent.iteration + 1)
-                    # Update iteration if provided
-                    if iteration_id > self.agent.iteration:
-                        self.agent.iteration = iteration_id
-                    else:
-                        # If same or older iteration, just process current state
-                        pass
-                except (json.JSONDecodeError, KeyError):
-                    # No iteration ID in message, increment as before
-                    self.agent.iteration += 1
-                
-                # Apply evaporation to all edges
-                for i in self.agent.pheromone:
-                    for j in self.agent.pheromone[i]:
-                        self.agent.pheromone[i][j] *= self.agent.decay_coefficient
-                
-                # Filter tours for this iteration
-                iteration_tours = [
-                    tour for tour in self.agent.iteration_tours
-                    if tour.get("iteration_id") == self.agent.iteration
-                ]
-                
-                # Find best tour from this iteration
-                if iteration_tours:
-                    iteration_best = max(
-                        iteration_tours,
-                        key=lambda x: x["count"]
-                    )
-                    
-                    # Update global best
-                    if iteration_best["count"] > self.agent.global_best_count:
-                        self.agent.global_best_tour = iteration_best["tour"]
-                        self.agent.global_best_count = iteration_best["count"]
-                        self.agent.best_solutions.append({
-                            "tour": iteration_best["tour"],
-                            "count": iteration_best["count"],
-                            "iteration": self.agent.iteration
-                        })
-                        print(f"New global best: {iteration_best['count']} markets")
-                    
-                    # Reinforce ONLY the global best solution (elitism)
-                    if self.agent.global_best_tour:
-                        reward = self.agent.global_best_count / self.agent.num_locations
-                        deposit_amount = reward * self.agent.reward_multiplier
-                        
-                        for idx in range(len(self.agent.global_best_tour) - 1):
-                            # map market ids to indices in the pheromone matrix
-                            from_loc = self.agent.market_to_index[self.agent.global_best_tour[idx]]
-                            to_loc = self.agent.market_to_index[self.agent.global_best_tour[idx + 1]]
-                            # update pheromone matrix
-                            self.agent.pheromone[from_loc][to_loc] += deposit_amount
+                data = orjson.loads(msg.body)
+                from_market_id = data["from"]
+                correlation_id = data.get("correlation_id")
                 
-                # Clear tours for the iteration we just processed (to avoid accumulation)
-                self.agent.iteration_tours = [
-                    tour for tour in self.agent.iteration_tours
-                    if tour.get("iteration_id") != self.agent.iteration
-                ]
+                row = self.agent.pheromone_row(from_market_id)
                 
-                # Save pheromone matrix for this iteration
-                self.agent.save_pheromone_matrix()
-                
-                # Send acknowledgment with iteration ID
                 response = msg.make_reply()
-                response.body = json.dumps({
-                    "iteration_id": self.agent.iteration
+                response.body = _dumps({
+                    "from": from_market_id,
+                    "pheromones": row,
+                    "correlation_id": correlation_id
                 })
-                response.set_metadata("performative", "iteration_updated")
+                response.set_metadata("performative", "pheromone_row_response")
+                if correlation_id:
+                    response.set_metadata("correlation_id", correlation_id)
+                
                 await self.send(response)
-    
-    class BestSolutionBehavior(CyclicBehaviour):
-        """Responds to best solution queries from coordinator"""
-        async def run(self):
+            except (orjson.JSONDecodeError, KeyError, TypeError) as e:
+                # Invalid message, ignore
+                print(f"Invalid pheromone row query message: {e}")
+        
+        async def handle_deposit(self, msg):
+            """Collects tour submissions from ants (no immediate update)"""
             try:
-                msg = await self.receive(timeout=5)
-            except asyncio.CancelledError:
-                return
-            if msg:
-                try:
-                    response = msg.make_reply()
-                    if self.agent.best_solutions:
-                        best = self.agent.best_solutions[-1]
-                        response.body = json.dumps({
-                            "best_count": best["count"],
-                            "best_tour": best["tour"],
-                            "iteration": best["iteration"]
-                        })
-                    else:
-                        response.body = json.dumps({
-                            "best_count": self.agent.global_best_count,
-                            "best_tour": self.agent.global_best_tour if self.agent.global_best_tour else [],
-                            "iteration": self.agent.iteration
-                        })
-                    response.set_metadata("performative", "best_solution_response")
-                    await self.send(response)
-                except Exception as e:
-                    print(f"Error in best solution response: {e}")
+                data = orjson.loads(msg.body)
+                tour = data["tour"]
+                iteration_id = data.get("iteration_id", self.agent.iteration)
+                self.agent.add_tour(tour, iteration_id, data.get("ant_id"))
+            except (orjson.JSONDecodeError, KeyError) as e:
+                # Invalid message, ignore
+                print(f"Invalid tour deposit message: {e}")
+        
+        async def handle_end_iteration(self, msg):
+            """Updates pheromones after all ants complete iteration"""
+            try:
+                data = orjson.loads(msg.body)
+                iteration_id = data.get("iteration_id", self.agent.iteration + 1)
+            except (orjson.JSONDecodeError, KeyError):
+                # No iteration ID in message, increment as before
+                iteration_id = self.agent.iteration + 1
+            
+            self.agent.end_iteration(iteration_id)
+            
+            # Send acknowledgment with iteration ID
+            response = msg.make_reply()
+            response.body = _dumps({
+                "iteration_id": self.agent.iteration
+            })
+            response.set_metadata("performative", "iteration_updated")
+            await self.send(response)
+        
+        async def handle_best_solution(self, msg):
+            """Responds to best solution queries from coordinator"""
+            try:
+                response = msg.make_reply()
+                response.body = _dumps(self.agent.best_solution())
+                response.set_metadata("performative", "best_solution_response")
+                await self.send(response)
+            except Exception as e:
+                print(f"Error in best solution response: {e}")
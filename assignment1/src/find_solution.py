@@ -1,12 +1,29 @@
 import asyncio
 import argparse
-import json
+import contextlib
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
 from typing import Optional
+import orjson
 from utils import load_market_data, evaluate_route_detailed, plot_route
 from ga import run_ga
-from aco import AntAgent, CoordinatorAgent, PheromoneManagerAgent
+from aco import AntAgent, CoordinatorAgent, PheromoneManagerAgent, run_aco_numpy
+
+try:
+    # Installed with SPADE on Linux/macOS
+    import uvloop
+except ImportError:
+    uvloop = None
+
+
+def run_event_loop(coro):
+    """Run coro to completion like asyncio.run, on a uvloop event loop where available."""
+    if uvloop is not None:
+        return uvloop.run(coro)
+    return asyncio.run(coro)
 
 
 def ensure_output_dir(run_id: Optional[str]):
@@ -36,10 +53,7 @@ def load_parameters(params_file: Optional[str]):
     if not params_path.exists():
         raise FileNotFoundError(f"Parameter file not found: {params_file}")
     
-    with params_path.open("r", encoding="utf-8") as fp:
-        params = json.load(fp)
-    
-    return params
+    return orjson.loads(params_path.read_bytes())
 
 
 def persist_results(output_dir: Path, algorithm: str, routes: dict, fitnesses: dict, *, run_id: str, service_time: int, days: int):
@@ -54,21 +68,35 @@ def persist_results(output_dir: Path, algorithm: str, routes: dict, fitnesses: d
         "fitnesses": serialised_fitnesses
     }
     output_path = output_dir / f"{algorithm}_results.json"
-    with output_path.open("w", encoding="utf-8") as fp:
-        json.dump(payload, fp, indent=2)
+    output_path.write_bytes(orjson.dumps(payload, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
     print(f"{algorithm.upper()} results saved to {output_path}")
 
 
-def run_genetic_algorithm(markets, travel_times, service_time, days, params=None):
+def run_ga_restart(job):
+    """Run one independently seeded GA (process pool worker of run_genetic_algorithm)."""
+    markets, travel_times, service_time, params, seed = job
+    # Forked workers inherit the parent's random state, so every restart needs its own seed
+    random.seed(seed)
+    return run_ga(
+        markets=markets,
+        travel_times=travel_times,
+        service_time=service_time,
+        params=params,
+        verbose=False,
+    )
+
+
+def run_genetic_algorithm(markets, travel_times, service_time, days, params=None, restarts=1):
     """
     Run GA optimization.
     
     Args:
         markets: Dictionary of market data
-        travel_times: Dictionary of travel times between markets
+        travel_times: Travel-time matrix indexed by market id
         service_time: Service time per market in minutes
         days: Number of days to optimize
         params: Dictionary of GA parameters (see run_ga for details)
+        restarts: Independent GA runs per day, run in parallel processes; the best one is kept
     """
     print("\n" + "="*70)
     print("GENETIC ALGORITHM (DEAP)")
@@ -77,39 +105,164 @@ def run_genetic_algorithm(markets, travel_times, service_time, days, params=None
     best_route_all_days = {}
     best_fitness_all_days = {}
     
+    # Days depend on each other (a day only gets the markets left over by the previous ones),
+    # so only the restarts within a day run in parallel
+    if restarts > 1:
+        pool = ProcessPoolExecutor(max_workers=min(restarts, os.cpu_count() or 1))
+    else:
+        pool = contextlib.nullcontext()
+    
+    with pool as executor:
+        for day in range(days):
+            print("\n" + "="*70)
+            print(f"Day {day + 1}")
+            print("="*70)
+            
+            if executor is None:
+                best_route, best_fitness = run_ga(
+                    markets=markets,
+                    travel_times=travel_times,
+                    service_time=service_time,
+                    params=params,
+                    verbose=True,
+                )
+            else:
+                jobs = [(markets, travel_times, service_time, params, random.getrandbits(32)) for _ in range(restarts)]
+                results = list(executor.map(run_ga_restart, jobs))
+                print(f"Restart fitnesses: {[fitness for _, fitness in results]}")
+                best_route, best_fitness = max(results, key=lambda result: result[1])
+            
+            print(f"GA Best Solution for day {day + 1}: {best_fitness} markets visited")
+            print(best_route)
+            
+            best_route_all_days[day + 1] = best_route
+            best_fitness_all_days[day + 1] = best_fitness
+            
+            visited = set(best_route)
+            markets = {key: value for key, value in markets.items() if int(key) not in visited}
+            
+            print(f"Unvisited markets: {len(markets)}")
+    
+    return best_route_all_days, best_fitness_all_days
+
+
+def run_ant_colony_numpy(markets, travel_times, service_time, days, params=None, output_dir=None):
+    """
+    Run ACO optimization in this process with the NumPy colony (no agents, no event loop).
+    
+    Args:
+        markets: Dictionary of market data
+        travel_times: Travel-time matrix indexed by market id
+        service_time: Service time per market in minutes
+        days: Number of days to optimize
+        params: Dictionary of ACO parameters (see run_aco_numpy for details)
+        output_dir: Directory for the pheromone matrices (None to skip saving them)
+    """
+    print("\n" + "="*70)
+    print("ANT COLONY OPTIMIZATION (NumPy)")
+    print("="*70)
+    
+    best_route_all_days = {}
+    best_fitness_all_days = {}
+    
     for day in range(days):
         print("\n" + "="*70)
         print(f"Day {day + 1}")
         print("="*70)
         
-        best_route, best_fitness = run_ga(
-            markets=markets,
-            travel_times=travel_times,
-            service_time=service_time,
-            params=params,
-            verbose=True,
-        )
-    
-        print(f"GA Best Solution for day {day + 1}: {best_fitness} markets visited")
-        print(best_route)
+        best_route, best_fitness = run_aco_numpy(markets, travel_times, service_time, params=params, output_dir=output_dir, day=day + 1)
+        
+        print(f"ACO Best Solution: {best_fitness} markets visited")
         
         best_route_all_days[day + 1] = best_route
         best_fitness_all_days[day + 1] = best_fitness
-            
-        markets = {key: value for key, value in markets.items() if int(key) not in best_route}
         
-        print(f"Unvisited markets: {len(markets)}")
+        visited = set(best_route)
+        markets = {key: value for key, value in markets.items() if int(key) not in visited}
         
+        print(f"Unvisited markets: {len(markets)}")
+    
     return best_route_all_days, best_fitness_all_days
 
 
-async def run_ant_colony_optimization(markets, travel_times, service_time, days, params=None, output_dir=None):
+async def run_agent_colony(markets, travel_times, service_time, aco_params, output_dir, day, jid_prefix, local_mode):
+    """
+    Run one day of ACO with SPADE agents (ants, pheromone manager and coordinator over XMPP).
+    
+    Returns:
+        best solution reported by the coordinator (dict with best_count and best_tour), or None
+    """
+    pheromone_mgr = PheromoneManagerAgent(
+        f"{jid_prefix}pheromone@localhost",
+        "password123",
+        num_locations=len(markets),
+        markets=markets,
+        initial_pheromone=aco_params["initial_pheromone"],
+        decay=aco_params["decay"],
+        reward_multiplier=aco_params["reward_multiplier"],
+        output_dir=output_dir,
+        day=day
+    )
+    
+    # In local mode the per-step pheromone traffic and the iteration signalling bypass the XMPP server
+    local_manager = pheromone_mgr if local_mode else None
+    
+    num_ants = aco_params["num_ants"]
+    ants = []
+    for i in range(num_ants):
+        ant = AntAgent(
+            f"{jid_prefix}ant_{i}@localhost",
+            f"password{i}",
+            ant_id=i,
+            markets=markets,
+            travel_times=travel_times,
+            manager_jid=str(pheromone_mgr.jid),
+            service_time=service_time,
+            alpha=aco_params["alpha"],
+            beta=aco_params["beta"],
+            pheromone_manager=local_manager
+        )
+        ants.append(ant)
+    
+    ant_jids = [str(ant.jid) for ant in ants]
+    coordinator_jid = f"{jid_prefix}coordinator@localhost"
+    coordinator = CoordinatorAgent(
+        coordinator_jid,
+        "password123",
+        pheromone_manager_jid=str(pheromone_mgr.jid),
+        ant_jids=ant_jids,
+        num_iterations=aco_params["num_iterations"],
+        pheromone_manager=local_manager,
+        ants=ants if local_mode else None
+    )
+    
+    # Update ants with coordinator JID
+    for ant in ants:
+        ant.coordinator_jid = coordinator_jid
+    
+    await pheromone_mgr.start(auto_register=True)
+    for ant in ants:
+        await ant.start(auto_register=True)
+    await coordinator.start(auto_register=True)
+    
+    # Wakes up as soon as the coordinator finished its last iteration
+    await coordinator.finished.wait()
+    
+    await coordinator.stop()
+    for ant in ants:
+        await ant.stop()
+    await pheromone_mgr.stop()
+    
+    return coordinator.best_solution
+
+
+async def run_ant_colony_optimization(markets, travel_times, service_time, days, params=None, output_dir=None, jid_prefix="", local_mode=False, use_agents=False):
     """
     Run ACO optimization.
     
     Args:
         markets: Dictionary of market data
-        travel_times: Dictionary of travel times between markets
+        travel_times: Travel-time matrix indexed by market id
         service_time: Service time per market in minutes
         days: Number of days to optimize
         params: Dictionary of ACO parameters. If None, uses defaults:
@@ -120,8 +273,19 @@ async def run_ant_colony_optimization(markets, travel_times, service_time, days,
             - alpha: 1.0 (pheromone weight)
             - beta: 2.0 (heuristic weight)
             - reward_multiplier: 2.0 (pheromone deposit multiplier)
+        output_dir: Directory for the pheromone matrices (None to skip saving them)
+        jid_prefix: Prefix for all agent JIDs, so several runs can share one XMPP server
+        local_mode: Ants and coordinator call the pheromone manager directly instead of
+            messaging it over XMPP, and the coordinator runs the ants' tours with
+            asyncio.gather (all agents run in this process anyway)
+        use_agents: Run the colony as SPADE agents (needs the XMPP server) instead of the
+            in-process NumPy implementation (run_ant_colony_numpy); jid_prefix and local_mode
+            only apply to agents
     """
-    # Default parameters
+    if not use_agents:
+        return run_ant_colony_numpy(markets, travel_times, service_time, days, params=params, output_dir=output_dir)
+
+# Default parameters
     default_params = {
         "num_ants": 20,
         "num_iterations": 5,
@@ -149,65 +313,8 @@ async def run_ant_colony_optimization(markets, travel_times, service_time, days,
         print(f"Day {day + 1}")
         print("="*70)
         
-        pheromone_mgr = PheromoneManagerAgent(
-            "pheromone@localhost",
-            "password123",
-            num_locations=len(markets),
-            markets=markets,
-            initial_pheromone=aco_params["initial_pheromone"],
-            decay=aco_params["decay"],
-            reward_multiplier=aco_params["reward_multiplier"],
-            output_dir=output_dir,
-            day=day + 1
-        )
-        
-        num_ants = aco_params["num_ants"]
-        ants = []
-        for i in range(num_ants):
-            ant = AntAgent(
-                f"ant_{i}@localhost",
-                f"password{i}",
-                ant_id=i,
-                markets=markets,
-                travel_times=travel_times,
-                manager_jid=str(pheromone_mgr.jid),
-                service_time=service_time,
-                alpha=aco_params["alpha"],
-                beta=aco_params["beta"]
-            )
-            ants.append(ant)
-        
-        ant_jids = [str(ant.jid) for ant in ants]
-        coordinator_jid = "coordinator@localhost"
-        coordinator = CoordinatorAgent(
-            coordinator_jid,
-            "password123",
-            pheromone_manager_jid=str(pheromone_mgr.jid),
-            ant_jids=ant_jids,
-            num_iterations=aco_params["num_iterations"]
-        )
-        
-        # Update ants with coordinator JID
-        for ant in ants:
-            ant.coordinator_jid = coordinator_jid
-        
-        await pheromone_mgr.start(auto_register=True)
-        for ant in ants:
-            await ant.start(auto_register=True)
-        await coordinator.start(auto_register=True)
-        
-        while coordinator.is_alive():
-            try:
-                await asyncio.sleep(5)
-            except KeyboardInterrupt:
-                break
-        
-        await coordinator.stop()
-        for ant in ants:
-            await ant.stop()
-        await pheromone_mgr.stop()
-        
-        best_solution = coordinator.best_solution
+        best_solution = await run_agent_colony(markets, travel_times, service_time, aco_params, output_dir, day + 1, jid_prefix, local_mode)
+
         if best_solution:
             best_route = best_solution.get('best_tour', [])
             best_fitness = best_solution.get('best_count', 0)
@@ -217,10 +324,11 @@ async def run_ant_colony_optimization(markets, travel_times, service_time, days,
             best_route_all_days[day + 1] = best_route
             best_fitness_all_days[day + 1] = best_fitness
             
-            markets = {key: value for key, value in markets.items() if int(key) not in best_route}
+            visited = set(best_route)
+            markets = {key: value for key, value in markets.items() if int(key) not in visited}
             
             print(f"Unvisited markets: {len(markets)}")
-            
+    
     return best_route_all_days, best_fitness_all_days
 
 
@@ -234,6 +342,9 @@ def main():
     parser.add_argument("--run_id", default=None, help="Optional identifier for this execution; defaults to timestamp")
     parser.add_argument("--plot", action="store_true", help="Plot the routes")
     parser.add_argument("--params", default=None, help="Path to JSON file containing algorithm parameters")
+    parser.add_argument("--local_mode", action="store_true", help="ACO with --use_agents: access the pheromone manager directly instead of over XMPP")
+    parser.add_argument("--use_agents", action="store_true", help="ACO: run the colony as SPADE agents over XMPP instead of in-process")
+    parser.add_argument("--ga_restarts", type=int, default=1, help="GA: independent runs per day in parallel processes, keeping the best")
     args = parser.parse_args()
     
     # Load parameters if provided
@@ -260,14 +371,14 @@ def main():
     output_dir, run_id = ensure_output_dir(args.run_id)
     
     if args.algorithm == "ga":
-        routes, fitnesses = run_genetic_algorithm(markets, travel_times, args.service_time, args.days, params=ga_params)
+        routes, fitnesses = run_genetic_algorithm(markets, travel_times, args.service_time, args.days, params=ga_params, restarts=args.ga_restarts)
         persist_results(output_dir, "ga", routes, fitnesses, run_id=run_id, service_time=args.service_time, days=args.days)
         
         if args.plot:
             plot_route(routes, markets)
             
     elif args.algorithm == "aco":
-        routes, fitnesses = asyncio.run(run_ant_colony_optimization(markets, travel_times, args.service_time, args.days, params=aco_params, output_dir=output_dir))
+        routes, fitnesses = run_event_loop(run_ant_colony_optimization(markets, travel_times, args.service_time, args.days, params=aco_params, output_dir=output_dir, local_mode=args.local_mode, use_agents=args.use_agents))
         persist_results(output_dir, "aco", routes, fitnesses, run_id=run_id, service_time=args.service_time, days=args.days)
         
         if args.plot:
@@ -275,11 +386,11 @@ def main():
             
     else:
         # Run GA
-        ga_routes, ga_fitnesses = run_genetic_algorithm(markets, travel_times, args.service_time, args.days, params=ga_params)
+        ga_routes, ga_fitnesses = run_genetic_algorithm(markets, travel_times, args.service_time, args.days, params=ga_params, restarts=args.ga_restarts)
         persist_results(output_dir, "ga", ga_routes, ga_fitnesses, run_id=run_id, service_time=args.service_time, days=args.days)
         
         # Run ACO
-        aco_routes, aco_fitnesses = asyncio.run(run_ant_colony_optimization(markets, travel_times, args.service_time, args.days, params=aco_params, output_dir=output_dir))
+        aco_routes, aco_fitnesses = run_event_loop(run_ant_colony_optimization(markets, travel_times, args.service_time, args.days, params=aco_params, output_dir=output_dir, local_mode=args.local_mode, use_agents=args.use_agents))
         persist_results(output_dir, "aco", aco_routes, aco_fitnesses, run_id=run_id, service_time=args.service_time, days=args.days)
         
         if args.plot:
@@ -1,75 +1,130 @@
+import array
 import random
 import numpy as np
 from deap import base, creator, tools, algorithms
 
+# Below this many individuals per generation, evaluating them one by one is faster than the batch kernel
+BATCH_EVAL_MIN_SIZE = 128
 
-def evaluate_route(individual, markets, travel_times, service_time):
+
+def build_market_arrays(markets, travel_times):
+    """
+    Precompute positional lookups so the fitness loop avoids per-access
+    int/str key conversions and dict lookups.
+    
+    Returns:
+        market_ids, opens, closes, tt where tt[i][j] is the travel time
+        between market_ids[i] and market_ids[j]
+    """
+    market_ids = [int(key) for key in markets.keys()]
+    opens = [markets[str(market_id)]["opens_minutes"] for market_id in market_ids]
+    closes = [markets[str(market_id)]["closes_minutes"] for market_id in market_ids]
+    tt = travel_times[np.ix_(market_ids, market_ids)].tolist()
+    return market_ids, opens, closes, tt
+
+
+def evaluate_route(individual, opens, closes, travel_times, service_time):
     """
     Evaluate a route and return fitness (number of markets visited).
-    Individual contains 0-based indices, convert to 1-based market IDs.
+    Individual contains 0-based indices into the precomputed market arrays.
+    
+    Kept as a plain loop over int indices and lists: it only accounts for a
+    few percent of a GA run (individual copying in DEAP dominates), so a
+    compiled kernel would not pay for the extra dependency.
     """
     if not individual or len(individual) == 0:
         return (0,)
     
-    # Convert 0-based indices to valid market IDs
-    market_ids = [int(key) for key in markets.keys()]
-    market_sequence = [market_ids[idx] for idx in individual]
-    
-    feasible_route = []
-    current_time = markets[str(market_sequence[0])]["opens_minutes"]
+    visited = 0
+    last_idx = None
+    current_time = opens[individual[0]]
     
-    for market_id in market_sequence:
-        market = markets[str(market_id)]
-        
-        if not feasible_route:
+    for idx in individual:
+        if last_idx is None:
             arrival_time = current_time
         else:
-            travel_time = travel_times[feasible_route[-1]][market_id]
-            arrival_time = current_time + travel_time
+            arrival_time = current_time + travel_times[last_idx][idx]
         
-        if arrival_time < market["opens_minutes"]:
-            arrival_time = market["opens_minutes"]
+        if arrival_time < opens[idx]:
+            arrival_time = opens[idx]
         
-        if arrival_time > market["closes_minutes"]:
+        if arrival_time > closes[idx]:
             continue
         
         departure_time = arrival_time + service_time
         
-        feasible_route.append(market_id)
+        visited += 1
+        last_idx = idx
         current_time = departure_time
     
-    fitness = len(feasible_route)
-    return (fitness,)
+    return (visited,)
 
 
-def get_feasible_route(individual, markets, travel_times, service_time):
-    """Get the actual feasible route from an individual."""
-    if not individual or len(individual) == 0:
+def build_batch_arrays(opens, closes, travel_times):
+    """
+    NumPy versions of the market arrays for evaluate_population. The travel-time
+    matrix gets an extra all-zero last row that stands for "no stop yet".
+    """
+    tt = np.zeros((len(travel_times) + 1, len(travel_times)), dtype=np.int64)
+    tt[:-1] = travel_times
+    return np.array(opens, dtype=np.int64), np.array(closes, dtype=np.int64), tt
+
+
+def evaluate_population(individuals, opens, closes, travel_times, service_time):
+    """
+    Evaluate a batch of routes at once; gives the same fitness as evaluate_route
+    for every individual. Arrays come from build_batch_arrays.
+    
+    Loops over the route positions and vectorizes over the individuals, so the
+    Python-level step count is the route length instead of population x route length.
+    """
+    if not individuals:
         return []
     
-    # Convert 0-based indices to valid market IDs
-    market_ids = [int(key) for key in markets.keys()]
-    market_sequence = [market_ids[idx] for idx in individual]
+    # Individuals are equally long int32 arrays
+    routes = np.frombuffer(b"".join(individuals), dtype=np.int32).reshape(len(individuals), -1)
+    if routes.shape[1] == 0:
+        return [(0,)] * len(individuals)
     
-    feasible_route = []
-    current_time = markets[str(market_sequence[0])]["opens_minutes"]
+    visited = np.zeros(len(routes), dtype=np.int64)
+    current_time = opens[routes[:, 0]]
+    last_idx = np.full(len(routes), len(travel_times) - 1)
     
-    for market_id in market_sequence:
-        market = markets[str(market_id)]
+    for idx in routes.T:
+        arrival_time = np.maximum(current_time + travel_times[last_idx, idx], opens[idx])
         
-        if not feasible_route:
+        # Infeasible stops are skipped, the others advance time and position
+        feasible = arrival_time <= closes[idx]
+        visited += feasible
+        np.copyto(last_idx, idx, where=feasible)
+        np.copyto(current_time, arrival_time + service_time, where=feasible)
+    
+    return [(count,) for count in visited.tolist()]
+
+
+def get_feasible_route(individual, market_ids, opens, closes, travel_times, service_time):
+    """Get the actual feasible route (market IDs) from an individual."""
+    if not individual or len(individual) == 0:
+        return []
+    
+    feasible_route = []
+    last_idx = None
+    current_time = opens[individual[0]]
+    
+    for idx in individual:
+        if last_idx is None:
             arrival_time = current_time
         else:
-            travel_time = travel_times[feasible_route[-1]][market_id]
-            arrival_time = current_time + service_time + travel_time
+            arrival_time = current_time + service_time + travel_times[last_idx][idx]
         
-        if arrival_time < market["opens_minutes"]:
-            arrival_time = market["opens_minutes"]
+        if arrival_time < opens[idx]:
+            arrival_time = opens[idx]
         
-        if arrival_time > market["closes_minutes"]:
+        if arrival_time > closes[idx]:
             continue
         
-        feasible_route.append(market_id)
+        feasible_route.append(market_ids[idx])
+        last_idx = idx
         current_time = arrival_time
     
     return feasible_route
@@ -81,7 +136,7 @@ def run_ga(markets, travel_times, service_time=30, params=None, verbose=True):
     
     Args:
         markets: Dictionary of market data
-        travel_times: Dictionary of travel times between markets
+        travel_times: Travel-time matrix indexed by market id
         service_time: Service time per market in minutes
         params: Dictionary of GA parameters. If None, uses defaults:
             - population_size: 100
@@ -114,10 +169,13 @@ def run_ga(markets, travel_times, service_time=30, params=None, verbose=True):
     if not hasattr(creator, "FitnessMax"):
         creator.create("FitnessMax", base.Fitness, weights=(1.0,))
     if not hasattr(creator, "Individual"):
-        creator.create("Individual", list, fitness=creator.FitnessMax)
+        # Compact int array instead of list: much cheaper to clone in DEAP's variation step
+        creator.create("Individual", array.array, typecode='i', fitness=creator.FitnessMax)
     
     toolbox = base.Toolbox()
     
+    market_ids, opens, closes, tt = build_market_arrays(markets, travel_times)
+    
     num_markets = len(markets)
     market_indices = list(range(num_markets))
     
@@ -130,11 +188,23 @@ def run_ga(markets, travel_times, service_time=30, params=None, verbose=True):
     toolbox.register(
         "evaluate",
         evaluate_route,
-        markets=markets,
-        travel_times=travel_times,
+        opens=opens,
+        closes=closes,
+        travel_times=tt,
         service_time=service_time
     )
     
+    # eaSimple evaluates each generation via toolbox.map(toolbox.evaluate, invalid_ind):
+    # large generations go through the vectorized batch kernel instead
+    batch_arrays = build_batch_arrays(opens, closes, tt)
+    
+    def map_fitness(func, individuals):
+        if func is toolbox.evaluate and len(individuals) >= BATCH_EVAL_MIN_SIZE:
+            return evaluate_population(individuals, *batch_arrays, service_time)
+        return map(func, individuals)
+    
+    toolbox.register("map", map_fitness)
+    
     # Create initial population
     population = toolbox.population(n=ga_params["population_size"])
     hof = tools.HallOfFame(1)
@@ -162,8 +232,10 @@ def run_ga(markets, travel_times, service_time=30, params=None, verbose=True):
     best_fitness = int(best_individual.fitness.values[0])
     best_route = get_feasible_route(
         best_individual,
-        markets,
-        travel_times,
+        market_ids,
+        opens,
+        closes,
+        tt,
         service_time
     )
     
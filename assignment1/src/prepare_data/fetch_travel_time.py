@@ -4,61 +4,187 @@ from datetime import datetime
 import os
 from dotenv import load_dotenv
 import argparse
+import sqlite3
 from tqdm import tqdm
+from concurrent.futures import ThreadPoolExecutor
 
-def calculate_travel_times(api_key, markets_data):
+# Distance Matrix allows at most 100 elements (origins x destinations) per request
+BLOCK_SIZE = 10
+# Concurrent Distance Matrix requests (the client still enforces its own QPS limit)
+MAX_WORKERS = 10
+MODES = ["driving", "walking", "transit"]
+
+
+def chunks(items, size):
+    """Split a list into consecutive blocks of at most `size` items."""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def open_cache(cache_file):
+    """Open (and create if needed) the SQLite cache of fetched travel times."""
+    conn = sqlite3.connect(cache_file)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS travel_times ("
+        "oid INTEGER, did INTEGER, mode TEXT, duration INTEGER, "
+        "PRIMARY KEY (oid, did, mode))"
+    )
+    return conn
+
+
+def load_cache(conn):
+    """Returns {(origin_id, destination_id, mode): duration} for all cached pairs (None = no route)."""
+    return {(oid, did, mode): duration for oid, did, mode, duration in conn.execute("SELECT oid, did, mode, duration FROM travel_times")}
+
+
+def missing_pair_blocks(origin_block, destination_block, missing):
+    """
+    Split an origin x destination block into requests that cover only its pairs in `missing`
+    (every element is billed, so cached pairs and markets paired with themselves are left out).
+    Origins missing the same destinations share one request.
+    """
+    groups = {}
+    for origin in origin_block:
+        destination_ids = tuple(d['id'] for d in destination_block if (origin['id'], d['id']) in missing)
+        if destination_ids:
+            groups.setdefault(destination_ids, []).append(origin)
+    destinations_by_id = {d['id']: d for d in destination_block}
+    return [(origins, [destinations_by_id[i] for i in destination_ids]) for destination_ids, origins in groups.items()]
+
+
+def fetch_block(gmaps, mode, origin_block, destination_block):
+    """
+    Request one origin x destination block for a single mode.
+    Returns a {(origin_id, destination_id): travel_time} dict for the block.
+    """
+    origin_coords = [(m['latitude'], m['longitude']) for m in origin_block]
+    destination_coords = [(m['latitude'], m['longitude']) for m in destination_block]
+    block_names = f"{origin_block[0]['Name']}.. to {destination_block[0]['Name']}.."
+
+    try:
+        now = datetime.now()
+        matrix = gmaps.distance_matrix(origin_coords, destination_coords, mode=mode, departure_time=now)
+        rows = matrix['rows']
+        error = None
+    except googlemaps.exceptions.ApiError as e:
+        tqdm.write(f"API Error for {block_names} ({mode}): {e}")
+        rows, error = None, "API Error"
+    except Exception as e:
+        tqdm.write(f"An unexpected error for {block_names} ({mode}): {e}")
+        rows, error = None, "Error"
+
+    travel_times = {}
+    for i, origin in enumerate(origin_block):
+        for j, destination in enumerate(destination_block):
+            if rows is None:
+                travel_time = error
+            else:
+                element = rows[i]['elements'][j]
+                # No route found for this pair (e.g. ZERO_RESULTS)
+                travel_time = int(element['duration']['value']) if element.get('status') == "OK" else None
+            travel_times[(origin['id'], destination['id'])] = travel_time
+    return travel_times
+
+
+def calculate_travel_times(api_key, markets_data, cache_file=None, symmetric_modes=()):
     """
     Calculates the travel time in seconds between all pairs of markets using pre-fetched coordinates.
     travel times from A -> B cna be different than from B -> A
+    Pairs are requested in blocks of BLOCK_SIZE x BLOCK_SIZE via the Distance Matrix API,
+    with up to MAX_WORKERS requests in flight over the client's pooled session.
+    If cache_file is given, successful responses are stored there and already cached pairs are not requested again.
+    For modes in symmetric_modes only A -> B (A before B) is requested and B -> A is assumed to be the same.
     """
     gmaps = googlemaps.Client(key=api_key)
-    results = {}
 
     valid_markets = [m for m in markets_data if m.get('latitude') is not None and m.get('longitude') is not None]
 
-    for origin in tqdm(valid_markets):
-        origin_id = origin['id']
-        origin_name = origin['Name']
-        origin_coords = (origin['latitude'], origin['longitude'])
+    # Pre-create the nested result dicts so the output keeps the market order
+    results = {origin['id']: {destination['id']: {} for destination in valid_markets} for origin in valid_markets}
+
+    conn = open_cache(cache_file) if cache_file else None
+    cached = load_cache(conn) if conn else {}
+
+    position = {m['id']: i for i, m in enumerate(valid_markets)}
+    
+    jobs = []
+    for mode in MODES:
+        symmetric = mode in symmetric_modes
+        # Fill cached pairs and collect the (origin_id, destination_id) pairs that still have to be requested;
+        # for symmetric modes only the upper triangle (origin before destination), the mirror is filled from it
+        missing = set()
+        for origin in valid_markets:
+            for destination in valid_markets:
+                if origin['id'] == destination['id']:
+                    continue
+                key = (origin['id'], destination['id'], mode)
+                mirrored_key = (destination['id'], origin['id'], mode)
+                if key in cached:
+                    results[origin['id']][destination['id']][mode] = cached[key]
+                elif symmetric and mirrored_key in cached:
+                    results[origin['id']][destination['id']][mode] = cached[mirrored_key]
+                elif not symmetric or position[origin['id']] < position[destination['id']]:
+                    missing.add((origin['id'], destination['id']))
         
-        results[origin_id] = {}
+        missing_origin_ids = {oid for oid, _ in missing}
+        missing_destination_ids = {did for _, did in missing}
+        missing_origins = [m for m in valid_markets if m['id'] in missing_origin_ids]
+        missing_destinations = [m for m in valid_markets if m['id'] in missing_destination_ids]
+        
+        if symmetric:
+            # Upper triangle only: blocks on and above the diagonal (missing holds no pairs below it)
+            blocks = chunks([m for m in valid_markets if m['id'] in missing_origin_ids | missing_destination_ids], BLOCK_SIZE)
+            block_pairs = [(origin_block, destination_block) for i, origin_block in enumerate(blocks) for destination_block in blocks[i:]]
+        else:
+            block_pairs = [
+                (origin_block, destination_block)
+                for origin_block in chunks(missing_origins, BLOCK_SIZE)
+                for destination_block in chunks(missing_destinations, BLOCK_SIZE)
+            ]
+        for origin_block, destination_block in block_pairs:
+            for origins, destinations in missing_pair_blocks(origin_block, destination_block, missing):
+                jobs.append((mode, origins, destinations))
+
+    if cached:
+        print(f"Loaded {len(cached)} cached travel times, {len(jobs)} requests remaining")
+
+    # Requests are latency bound, so overlap them; results are merged in job order
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        block_results = executor.map(lambda job: fetch_block(gmaps, *job), jobs)
+        for (mode, _, _), travel_times in tqdm(zip(jobs, block_results), total=len(jobs)):
+            if mode in symmetric_modes:
+                travel_times.update({(did, oid): t for (oid, did), t in list(travel_times.items())})
+            for (origin_id, destination_id), travel_time in travel_times.items():
+                results[origin_id][destination_id][mode] = travel_time
+
+            # Cache successful blocks (errors are strings), one transaction per block
+            if conn and not any(isinstance(t, str) for t in travel_times.values()):
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO travel_times (oid, did, mode, duration) VALUES (?, ?, ?, ?)",
+                        [(oid, did, mode, t) for (oid, did), t in travel_times.items()]
+                    )
 
-        for destination in valid_markets:
-            destination_id = destination['id']
-            destination_name = destination['Name']
-            destination_coords = (destination['latitude'], destination['longitude'])
+    if conn:
+        conn.close()
 
+    for origin_id, destinations in results.items():
+        for destination_id, travel_times in destinations.items():
             if origin_id == destination_id:
-                results[origin_id][destination_id] = { "driving": 0, "walking": 0, "transit": 0 }
-                continue
-
-            modes = ["driving", "walking", "transit"]
-            travel_times = {}
-
-            for mode in modes:
-                try:
-                    now = datetime.now()
-                    directions = gmaps.directions(origin_coords, destination_coords, mode=mode, departure_time=now)
-                    
-                    if directions:
-                        travel_times[mode] = int(directions[0]['legs'][0]['duration']['value'])
-                    else:
-                        travel_times[mode] = None
-                except googlemaps.exceptions.ApiError as e:
-                    tqdm.write(f"API Error for {origin_name} to {destination_name} ({mode}): {e}")
-                    travel_times[mode] = "API Error"
-                except Exception as e:
-                    tqdm.write(f"An unexpected error for {origin_name} to {destination_name} ({mode}): {e}")
-                    travel_times[mode] = "Error"
-            
-            results[origin_id][destination_id] = travel_times
-            
+                # Travel time from a market to itself is always zero
+                destinations[destination_id] = { "driving": 0, "walking": 0, "transit": 0 }
+            else:
+                # Keep a fixed mode order regardless of which modes came from the cache
+                destinations[destination_id] = {mode: travel_times.get(mode) for mode in MODES}
+
     return results
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--input")
     parser.add_argument("--output")
+    parser.add_argument("--cache", default=None, help="SQLite file caching fetched travel times between runs")
+    parser.add_argument("--symmetric_modes", nargs="*", choices=MODES, default=[],
+                        help="Modes whose travel times are the same in both directions (only half the pairs are requested)")
     args = parser.parse_args()
 
     load_dotenv()
@@ -71,7 +197,7 @@ if __name__ == "__main__":
             with open(args.input, 'r', encoding='utf-8') as f:
                 markets = json.load(f)
             
-            travel_data = calculate_travel_times(api_key, markets)
+            travel_data = calculate_travel_times(api_key, markets, cache_file=args.cache, symmetric_modes=args.symmetric_modes)
             
             with open(args.output, "w", encoding='utf-8') as outfile:
                 json.dump(travel_data, outfile, indent=4)
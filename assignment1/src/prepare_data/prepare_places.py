@@ -1,40 +1,79 @@
 import json
 import argparse
+import os
 import re
+import sqlite3
+import textwrap
 import requests
 from tqdm import tqdm
+from concurrent.futures import ThreadPoolExecutor
+
+# Concurrent URL resolutions (each one mostly waits on a redirect round-trip)
+MAX_WORKERS = 32
+
+# One pooled session for all lookups, so the redirects reuse kept-alive connections
+# instead of a new TCP + TLS handshake per URL (sized so every worker keeps its connection)
+session = requests.Session()
+session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=MAX_WORKERS))
+
+# Coordinate formats in Google Maps URLs, tried in order
+COORDINATE_PATTERNS = [
+    re.compile(r"@(-?\d+\.\d+),(-?\d+\.\d+)"),           # Standard format: @lat,lng
+    re.compile(r"/search/(-?\d+\.\d+),.*?(-?\d+\.\d+)"),  # /search/lat,+lng
+]
+# Shortened links that have to be resolved first (also covers maps.app.goo.gl)
+SHORT_URL_HOSTS = ("goo.gl", "g.page")
+
+def match_coordinates(url):
+    """Returns (latitude, longitude) embedded in a URL, or None."""
+    for pattern in COORDINATE_PATTERNS:
+        match = pattern.search(url)
+        if match:
+            latitude, longitude = match.groups()
+            return (float(latitude), float(longitude))
+    return None
 
 def get_coordinates_from_url(url):
     """
     Extracts latitude and longitude from a Google Maps URL.
+    Only shortened links without embedded coordinates need a network request.
     """
-    try:
-        if "goo.gl" in url or "g.page" in url or "maps.app.goo.gl" in url:
-            response = requests.head(url, allow_redirects=True)
-            url = response.url
-
-        # Regex to find latitude and longitude in the URL
-        patterns_to_try = [
-            r"@(-?\d+\.\d+),(-?\d+\.\d+)",           # Standard format: @lat,lng
-            r"/search/(-?\d+\.\d+),.*?(-?\d+\.\d+)",  # /search/lat,+lng
-        ]
+    coords = match_coordinates(url)
+    if coords:
+        return coords
 
-        for pattern in patterns_to_try:
-            match = re.search(pattern, url)
-            if match:
-                latitude, longitude = match.groups()
-                return (float(latitude), float(longitude))
-    except requests.RequestException as e:
-        print(f"Could not resolve shortened URL {url}. Error: {e}")
-        return None
+    if any(host in url for host in SHORT_URL_HOSTS):
+        try:
+            response = session.head(url, allow_redirects=True)
+        except requests.RequestException as e:
+            print(f"Could not resolve shortened URL {url}. Error: {e}")
+            return None
+        url = response.url
+        coords = match_coordinates(url)
+        if coords:
+            return coords
     
     print(f"Could not extract coordinates from URL: {url}")
     return None
 
-def enrich_data(input_file, output_file):
+def open_cache(cache_file):
+    """Open (and create if needed) the SQLite cache of resolved URL coordinates."""
+    conn = sqlite3.connect(cache_file)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS coordinates ("
+        "url TEXT PRIMARY KEY, latitude REAL, longitude REAL)"
+    )
+    return conn
+
+def load_cache(conn):
+    """Returns {url: (latitude, longitude)} for all cached URLs."""
+    return {url: (latitude, longitude) for url, latitude, longitude in conn.execute("SELECT url, latitude, longitude FROM coordinates")}
+
+def enrich_data(input_file, output_file, cache_file=None):
     """
     Reads a JSON file, adds unique IDs, fetches geographic coordinates,
     and saves the enriched data to a new file.
+    If cache_file is given, resolved coordinates are stored there and cached URLs are not looked up again.
     """
     try:
         with open(input_file, 'r', encoding='utf-8') as f:
@@ -46,32 +85,55 @@ def enrich_data(input_file, output_file):
         print(f"Error: Could not decode JSON from {input_file}")
         return
 
-    enriched_data = []
-    for i, item in enumerate(tqdm(data)):
-        
-        item['id'] = i + 1
-        
-        coords = get_coordinates_from_url(item['Map'])
-        if coords:
-            item['latitude'] = coords[0]
-            item['longitude'] = coords[1]
-        else:
-            item['latitude'] = None
-            item['longitude'] = None
-        
-        enriched_data.append(item)
-
+    conn = open_cache(cache_file) if cache_file else None
+    cached = load_cache(conn) if conn else {}
+    if cached:
+        print(f"Loaded {len(cached)} cached coordinates")
+    
+    def lookup(url):
+        return cached[url] if url in cached else get_coordinates_from_url(url)
+    
+    # Resolving the URLs is network bound, so run the lookups concurrently. Items are written
+    # as soon as their coordinates arrive (executor.map keeps input order), in the same layout
+    # json.dump(..., indent=4) produces for the whole list. They go to a temp file that only
+    # replaces output_file once complete, so an interrupted run never leaves it truncated
+    tmp_file = f"{output_file}.tmp"
     try:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(enriched_data, f, indent=4, ensure_ascii=False)
+        with open(tmp_file, 'w', encoding='utf-8') as f, ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            all_coords = executor.map(lookup, [item['Map'] for item in data])
+            
+            f.write("[")
+            for i, (coords, item) in enumerate(zip(tqdm(all_coords, total=len(data)), data)):
+                
+                item['id'] = i + 1
+                
+                if coords:
+                    item['latitude'] = coords[0]
+                    item['longitude'] = coords[1]
+                    # Cache new successful lookups (the connection is only used from this thread)
+                    if conn and item['Map'] not in cached:
+                        with conn:
+                            conn.execute("INSERT OR REPLACE INTO coordinates (url, latitude, longitude) VALUES (?, ?, ?)", (item['Map'], *coords))
+                else:
+                    item['latitude'] = None
+                    item['longitude'] = None
+                
+                f.write(",\n" if i else "\n")
+                f.write(textwrap.indent(json.dumps(item, indent=4, ensure_ascii=False), "    "))
+            f.write("\n]" if data else "]")
+        os.replace(tmp_file, output_file)
     except IOError as e:
         print(f"Error writing to file {output_file}: {e}")
+    finally:
+        if conn:
+            conn.close()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--input")
     parser.add_argument("--output")
+    parser.add_argument("--cache", default=None, help="SQLite file caching resolved coordinates between runs")
     
     args = parser.parse_args()
     
-    enrich_data(args.input, args.output)
\ No newline at end of file
+    enrich_data(args.input, args.output, cache_file=args.cache)
\ No newline at end of file
@@ -1,15 +1,19 @@
 import asyncio
 import itertools
 import json
+import math
+import orjson
 import sys
 import os
+import time
 import contextlib
 import argparse
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
 from tqdm import tqdm
 
-from find_solution import run_ant_colony_optimization, run_genetic_algorithm
+from find_solution import run_ant_colony_numpy, run_ant_colony_optimization, run_event_loop, run_genetic_algorithm
 from utils import load_market_data
 
 # parameter grids
@@ -45,7 +49,118 @@ def suppress_stdout():
 
 def generate_combinations(grid):
     keys, values = zip(*grid.items())
-    return [dict(zip(keys, v)) for v in itertools.product(*values)]
+    return (dict(zip(keys, v)) for v in itertools.product(*values))
+
+def count_combinations(grid):
+    return math.prod(len(v) for v in grid.values())
+
+def config_key(args, params):
+    # stable across processes (unlike hash() of str-containing tuples), independent of key order
+    return json.dumps({
+        "algorithm": args.algorithm,
+        "days": args.days,
+        "service_time": args.service_time,
+        "places_file": str(args.places_file),
+        "travel_times_file": str(args.travel_times_file),
+        "parameters": params
+    }, sort_keys=True)
+
+def load_manifest(path):
+    # one {"key", "results", "offset"} line per finished run, pointing at its entry in a results NDJSON file
+    manifest = {}
+    if path.exists():
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    record = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    # torn last line of an interrupted run
+                    continue
+                manifest[record["key"]] = (record["results"], record["offset"])
+    return manifest
+
+def load_finished_entries(manifest, keys):
+    # read the entries of finished runs back from their NDJSON files; missing or torn entries are skipped (and run again)
+    entries = {}
+    by_file = {}
+    for key in keys:
+        results, offset = manifest[key]
+        by_file.setdefault(results, []).append((offset, key))
+    for results, locations in by_file.items():
+        try:
+            with open(results, "rb") as f:
+                for offset, key in sorted(locations):
+                    f.seek(offset)
+                    try:
+                        entries[key] = orjson.loads(f.readline())
+                    except orjson.JSONDecodeError:
+                        pass
+        except OSError:
+            # results file of an earlier grid run was deleted
+            pass
+    return entries
+
+def new_entry(params):
+    return {
+        "parameters": params,
+        "timestamp": datetime.now().isoformat(),
+        "success": False,
+        "total_score": 0,
+        "routes": {},
+        "fitness_per_day": {}
+    }
+
+def complete_entry(entry, routes, fitnesses):
+    # Serialize keys (days) to strings for JSON compliance
+    entry["routes"] = {str(k): v for k, v in routes.items()}
+    entry["fitness_per_day"] = {str(k): v for k, v in fitnesses.items()}
+    entry["total_score"] = sum(fitnesses.values())
+    entry["success"] = True
+
+# market data of a trial worker process, loaded once by init_worker instead of being pickled per task
+_worker_data = {}
+
+def init_worker(places_file, travel_times_file):
+    _worker_data["markets"], _worker_data["travel_times"] = load_market_data(places_file, travel_times_file, mode="walking")
+
+def run_ga_trial(job):
+    params, service_time, days = job
+    entry = new_entry(params)
+    start = time.perf_counter()
+    try:
+        with suppress_stdout():
+            routes, fitnesses = run_genetic_algorithm(
+                markets=_worker_data["markets"],
+                travel_times=_worker_data["travel_times"],
+                service_time=service_time,
+                days=days,
+                params=params
+            )
+        complete_entry(entry, routes, fitnesses)
+    except Exception as e:
+        entry["error"] = str(e)
+    entry["duration_s"] = time.perf_counter() - start
+    return entry
+
+def run_aco_numpy_trial(job):
+    params, service_time, days = job
+    entry = new_entry(params)
+    start = time.perf_counter()
+    try:
+        with suppress_stdout():
+            routes, fitnesses = run_ant_colony_numpy(
+                markets=_worker_data["markets"],
+                travel_times=_worker_data["travel_times"],
+                service_time=service_time,
+                days=days,
+                params=params,
+                output_dir=None
+            )
+        complete_entry(entry, routes, fitnesses)
+    except Exception as e:
+        entry["error"] = str(e)
+    entry["duration_s"] = time.perf_counter() - start
+    return entry
 
 async def run_grid_search(args):
     run_id = datetime.now().strftime("%Y%m%d_%H%M%S_GRID")
@@ -54,74 +169,124 @@ async def run_grid_search(args):
 
     print(f"--- GRID SEARCH: {args.algorithm.upper()} ---")
     print(f"Output Directory: {output_dir}")
-
-    markets, travel_times = load_market_data(args.places_file, args.travel_times_file, mode="walking")
     
     grid = GA_GRID if args.algorithm == "ga" else ACO_GRID
     combinations = generate_combinations(grid)
     
-    print(f"Combinations: {len(combinations)}")
+    print(f"Combinations: {count_combinations(grid)}")
+
+    # successful configurations of earlier grid runs, keyed by config_key, so re-runs only do what is missing
+    # (unless --fresh asks for new samples of every configuration)
+    manifest_path = output_dir.parent / f"{args.algorithm}_grid_done.ndjson"
+    manifest = {} if args.fresh else load_manifest(manifest_path)
+    
+    seen = set()
+    keyed = []
     
-    results = []
-
-    for params in tqdm(combinations, unit="run"):
-        entry = {
-            "parameters": params,
-            "timestamp": datetime.now().isoformat(),
-            "success": False,
-            "total_score": 0,
-            "routes": {},
-            "fitness_per_day": {}
-        }
+    for params in combinations:
+        key = config_key(args, params)
+        if key in seen:
+            continue
+        seen.add(key)
+        keyed.append((key, params))
+    
+    finished = load_finished_entries(manifest, [key for key, _ in keyed if key in manifest])
+    reused = [finished[key] for key, _ in keyed if key in finished]
+    pending = [(key, params) for key, params in keyed if key not in finished]
 
-        try:
+    if reused:
+        print(f"Reusing {len(reused)} finished runs, {len(pending)} remaining")
+
+    # Results are streamed to NDJSON (one entry per line) as trials finish; only the best entry is kept in memory
+    full_path = output_dir / f"{args.algorithm}_all_results.ndjson"
+    written = 0
+    best_run = None
+
+    def record(key, entry, cached=False):
+        nonlocal written, best_run
+        offset = results_file.tell()
+        results_file.write(orjson.dumps(entry, option=orjson.OPT_APPEND_NEWLINE))
+        written += 1
+        if written % 50 == 0:
+            results_file.flush()
+            os.fsync(results_file.fileno())
+        if entry["success"]:
+            if best_run is None or entry["total_score"] > best_run["total_score"]:
+                best_run = entry
+            if not cached:
+                # the manifest only points at the entry (appended, never rewritten), so the entry must reach the file first
+                results_file.flush()
+                manifest_file.write(orjson.dumps(
+                    {"key": key, "results": str(full_path.resolve()), "offset": offset},
+                    option=orjson.OPT_APPEND_NEWLINE
+                ))
+                manifest_file.flush()
+    
+    with open(full_path, "ab") as results_file, open(manifest_path, "ab") as manifest_file:
+        for entry in reused:
+            record(None, entry, cached=True)
+
+        if args.algorithm == "ga" or not args.use_agents:
+            # GA and in-process ACO trials are independent and CPU bound: spread them over all cores
+            run_trial = run_ga_trial if args.algorithm == "ga" else run_aco_numpy_trial
+            jobs = [(params, args.service_time, args.days) for _, params in pending]
+            with ProcessPoolExecutor(
+                max_workers=args.workers,
+                initializer=init_worker,
+                initargs=(args.places_file, args.travel_times_file)
+            ) as executor:
+                entries = executor.map(run_trial, jobs)
+                for (key, _), entry in tqdm(zip(pending, entries), total=len(pending), unit="run"):
+                    record(key, entry)
+        else:
+            markets, travel_times = load_market_data(args.places_file, args.travel_times_file, mode="walking")
+
+            # ACO trials mostly wait on XMPP messages and polling sleeps, so several of them
+            # run concurrently in this event loop, each under its own JID prefix
+            semaphore = asyncio.Semaphore(args.workers)
+
+            async def run_aco_trial(trial, key, params):
+                async with semaphore:
+                    entry = new_entry(params)
+                    start = time.perf_counter()
+                    try:
+                        routes, fitnesses = await run_ant_colony_optimization(
+                            markets=markets,
+                            travel_times=travel_times,
+                            service_time=args.service_time,
+                            days=args.days,
+                            params=params,
+                            output_dir=None,
+                            jid_prefix=f"trial{trial}_",
+                            local_mode=args.local_mode,
+                            use_agents=True
+                        )
+                        complete_entry(entry, routes, fitnesses)
+
+                    except Exception as e:
+                        entry["error"] = str(e)
+                    entry["duration_s"] = time.perf_counter() - start
+
+                    # Slight delay for ACO cleanup
+                    await asyncio.sleep(0.1)
+                return key, entry
+
+            tasks = [
+                asyncio.create_task(run_aco_trial(trial, key, params))
+                for trial, (key, params) in enumerate(pending)
+            ]
             with suppress_stdout():
-                if args.algorithm == "ga":
-                    routes, fitnesses = run_genetic_algorithm(
-                        markets=markets,
-                        travel_times=travel_times,
-                        service_time=args.service_time,
-                        days=args.days,
-                        params=params
-                    )
-                else:
-                    routes, fitnesses = await run_ant_colony_optimization(
-                        markets=markets,
-                        travel_times=travel_times,
-                        service_time=args.service_time,
-                        days=args.days,
-                        params=params,
-                        output_dir=None 
-                    )
-
-            # Serialize keys (days) to strings for JSON compliance
-            entry["routes"] = {str(k): v for k, v in routes.items()}
-            entry["fitness_per_day"] = {str(k): v for k, v in fitnesses.items()}
-            entry["total_score"] = sum(fitnesses.values())
-            entry["success"] = True
-
-        except Exception as e:
-            entry["error"] = str(e)
-
-        results.append(entry)
-        
-        # Slight delay for ACO cleanup
-        if args.algorithm == "aco":
-            await asyncio.sleep(0.1)
-
-    # 1. Save all results
-    full_path = output_dir / f"{args.algorithm}_all_results.json"
-    with open(full_path, "w") as f:
-        json.dump(results, f, indent=2)
+                for next_done in tqdm(asyncio.as_completed(tasks), total=len(tasks), unit="run"):
+                    key, entry = await next_done
+                    record(key, entry)
+
+    # 1. All results
     print(f"\nAll results saved to: {full_path}")
 
     # 2. Save best result separately
-    successful_runs = [r for r in results if r["success"]]
-    if successful_runs:
-        best_run = max(successful_runs, key=lambda x: x['total_score'])
+    if best_run is not None:
         best_path = output_dir / f"{args.algorithm}_best_run.json"
-        with open(best_path, "w") as f:
-            json.dump(best_run, f, indent=2)
+        best_path.write_bytes(orjson.dumps(best_run, option=orjson.OPT_INDENT_2))
         print(f"Best run ({best_run['total_score']} markets) saved to: {best_path}")
     else:
         print("No successful runs recorded.")
@@ -133,6 +298,10 @@ if __name__ == "__main__":
     parser.add_argument("--algorithm", choices=["aco", "ga"], required=True)
     parser.add_argument("--days", type=int, default=1)
     parser.add_argument("--service_time", type=int, default=30)
-    
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Parallel trials (processes / concurrent ACO agent runs)")
+    parser.add_argument("--local_mode", action="store_true", help="ACO with --use_agents: access the pheromone manager directly instead of over XMPP")
+    parser.add_argument("--use_agents", action="store_true", help="ACO: run the colony as SPADE agents over XMPP instead of in-process")
+    parser.add_argument("--fresh", action="store_true", help="Re-run every configuration instead of reusing finished runs of earlier grid searches")
+
     args = parser.parse_args()
-    asyncio.run(run_grid_search(args))
\ No newline at end of file
+    run_event_loop(run_grid_search(args))
\ No newline at end of file
@@ -1,41 +1,107 @@
-import json
+import functools
+import os
+from pathlib import Path
+import numpy as np
+import orjson
 
+# Travel time (in the unit of the selected mode) used for pairs without a known connection
+UNREACHABLE = 10**6
 
-def load_market_data(places_file, travel_times_file, mode="fastest_public"):
+
+def _travel_time(tt, mode):
+    """Travel time for one origin/destination pair in the selected mode (None if unknown)."""
+    if mode == "fastest_public":
+        available = [t for t in (tt.get("walking"), tt.get("transit")) if t is not None]
+        return min(available) if available else None
+    value = tt.get(mode, 0)
+    return value // 60 if value is not None else None
+
+
+def _load_travel_matrix(travel_times_file, mode):
     """
-    Load and validate market and travel time data.
-    
-    Args:
-        places_file: JSON file with market metadata
-        travel_times_file: JSON with directed travel times
-        mode: "transit", "walking", or "driving", "fastest_public"
-    
-    Returns:
-        markets, travel_times: Processed data structures with integer keys
+    Parse the travel time JSON into a dense matrix indexed by market id.
+
+    The matrix is persisted as <travel_times_file>.<mode>.npz next to the JSON and
+    reused as long as it is newer than the JSON file.
     """
-    with open(places_file, 'r') as f:
-        markets_raw = json.load(f)
-    
-    with open(travel_times_file, 'r') as f:
-        travel_times_raw = json.load(f)
-    
+    cache_file = Path(travel_times_file).with_suffix(f".{mode}.npz")
+    if cache_file.exists() and os.path.getmtime(cache_file) >= os.path.getmtime(travel_times_file):
+        with np.load(cache_file) as cached:
+            return cached["travel_times"]
+
+    travel_times_raw = orjson.loads(Path(travel_times_file).read_bytes())
+
+    # Dense matrix indexed by market id (ids are small positive ints, so the id -> index map is the identity)
+    size = max(int(key) for key in travel_times_raw) + 1
+    travel_times = np.full((size, size), UNREACHABLE, dtype=np.int32)
+    for from_id, destinations in travel_times_raw.items():
+        for to_id, tt in destinations.items():
+            value = _travel_time(tt, mode)
+            if value is not None:
+                travel_times[int(from_id), int(to_id)] = value
+
+    # Write to a per-process temp file and rename, so parallel workers never read a partial cache
+    tmp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        with open(tmp_file, "wb") as f:
+            np.savez(f, travel_times=travel_times)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        # Read-only data directory: just skip the on-disk cache
+        pass
+
+    return travel_times
+
+
+@functools.lru_cache(maxsize=4)
+def _load_cached(places_file, places_mtime, travel_times_file, travel_times_mtime, mode):
+    """Parse both input files; memoized on paths and modification times."""
+    markets_raw = orjson.loads(Path(places_file).read_bytes())
+
     # Markets use string keys (for compatibility)
     markets = {str(m["id"]): m for m in markets_raw}
-    
+
     # Convert time strings to minutes since midnight
     for market in markets.values():
         opens_h, opens_m = map(int, market["Opens"].split(":"))
         closes_h, closes_m = map(int, market["Closes"].split(":"))
         market["opens_minutes"] = opens_h * 60 + opens_m
         market["closes_minutes"] = closes_h * 60 + closes_m
-    
-    # Convert nested string keys to integers for travel_times
-    travel_times = {
-        int(from_id): {
-            int(to_id): min(tt.get("walking"), tt.get("transit")) if mode == "fastest_public" else tt.get(mode, 0) // 60
-                for to_id, tt in destinations.items()
-        }
-        for from_id, destinations in travel_times_raw.items()
-    }
-    
+
+    travel_times = _load_travel_matrix(travel_times_file, mode)
+
+    # Markets without any travel data still need a (fully unreachable) row/column
+    size = max(int(key) for key in markets) + 1
+    if size > len(travel_times):
+        padded = np.full((size, size), UNREACHABLE, dtype=np.int32)
+        padded[:len(travel_times), :len(travel_times)] = travel_times
+        travel_times = padded
+
+    travel_times.setflags(write=False)
     return markets, travel_times
+
+
+def load_market_data(places_file, travel_times_file, mode="fastest_public"):
+    """
+    Load and validate market and travel time data.
+
+    Results are cached per process (keyed on file paths and modification times),
+    so repeated calls e.g. during a grid search do not re-parse the files.
+
+    Args:
+        places_file: JSON file with market metadata
+        travel_times_file: JSON with directed travel times
+        mode: "transit", "walking", or "driving", "fastest_public"
+
+    Returns:
+        markets, travel_times: markets keyed by string id, and a dense int32 travel-time
+        matrix indexed directly by market id (travel_times[from_id][to_id]); pairs
+        without data are set to UNREACHABLE. The matrix is shared and read-only.
+    """
+    markets, travel_times = _load_cached(
+        str(places_file), os.path.getmtime(places_file),
+        str(travel_times_file), os.path.getmtime(travel_times_file),
+        mode
+    )
+    # Fresh outer dict so callers can filter markets without touching the cached copy
+    return dict(markets), travel_times
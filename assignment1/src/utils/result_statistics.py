@@ -1,19 +1,19 @@
-import json
-import statistics
+import orjson
 import os
-import datetime
-from collections import defaultdict
 import sys
+import pandas as pd
 
 def load_data(filename):
-    """Loads the JSON data from the file."""
+    """Loads the JSON data from the file (a JSON list, or NDJSON with one entry per line)."""
     if not os.path.exists(filename):
         print(f"File '{filename}' not found.")
         return None
     try:
-        with open(filename, 'r') as f:
-            return json.load(f)
-    except json.JSONDecodeError:
+        with open(filename, 'rb') as f:
+            if filename.endswith(".ndjson"):
+                return [orjson.loads(line) for line in f if line.strip()]
+            return orjson.loads(f.read())
+    except orjson.JSONDecodeError:
         print(f"Error: {filename} contains invalid JSON.")
         return []
 
@@ -23,97 +23,73 @@ def analyze_results(data):
         print("No data to analyze.")
         return
 
-    valid_data = []
-    for d in data:
-        if 'parameters' not in d or 'total_score' not in d:
-            continue
-        
-        # Parse timestamp immediately for sorting
-        try:
-            d['_dt'] = datetime.datetime.fromisoformat(d.get('timestamp', ''))
-            valid_data.append(d)
-        except (ValueError, TypeError):
-            continue
-
-    if len(valid_data) < len(data):
-        print(f"Warning: Skipped {len(data) - len(valid_data)} malformed/untimestamped entries.")
-
-    total_runs = len(valid_data)
+    df = pd.DataFrame(
+        [d for d in data if 'parameters' in d and 'total_score' in d]
+    ).reindex(columns=['parameters', 'total_score', 'timestamp', 'success', 'duration_s'])
     
-    valid_data.sort(key=lambda x: x['_dt'])
+    # Parse timestamps for sorting; entries without a valid ISO timestamp are skipped
+    df['_dt'] = pd.to_datetime(df['timestamp'], format='ISO8601', errors='coerce')
+    df = df.dropna(subset=['_dt'])
 
-    all_durations = []
-    for i in range(total_runs - 1):
-        diff = valid_data[i+1]['_dt'] - valid_data[i]['_dt']
-        seconds = diff.total_seconds()
-        valid_data[i]['_duration'] = seconds
-        all_durations.append(seconds)
+    if len(df) < len(data):
+        print(f"Warning: Skipped {len(data) - len(df)} malformed/untimestamped entries.")
+
+    total_runs = len(df)
+    
+    df = df.sort_values('_dt', kind='stable').reset_index(drop=True)
+
+    # Duration of a run as measured by the grid search; older results without it fall back
+    # to the time until the next run started (the last run has none)
+    df['_duration'] = df['duration_s'].fillna(-df['_dt'].diff(-1).dt.total_seconds())
 
     # Global Stats
-    successes = [d for d in valid_data if d.get('success', False)]
-    scores = [d.get('total_score', 0) for d in valid_data]
+    successes = df['success'].fillna(False).astype(bool).sum()
+    scores = df['total_score']
 
     print(f"{'='*50}")
     print(f"OPTIMIZATION STATISTICS ({total_runs} Valid Runs)")
     print(f"{'='*50}")
 
-    success_rate = (len(successes) / total_runs) * 100 if total_runs > 0 else 0
+    success_rate = (successes / total_runs) * 100 if total_runs > 0 else 0
     print(f"Success Rate:   {success_rate:.2f}%")
 
-    if scores:
-        print(f"Mean Score:     {statistics.mean(scores):.2f}")
-        print(f"Max Score:      {max(scores)}")
+    if len(scores):
+        print(f"Mean Score:     {scores.mean():.2f}")
+        print(f"Max Score:      {scores.max()}")
 
-    if all_durations:
-        print(f"Mean Time/Run:  {statistics.mean(all_durations):.2f}s")
-        print(f"Total Duration: {sum(all_durations):.2f}s")
+    durations = df['_duration'].dropna()
+    if len(durations):
+        print(f"Mean Time/Run:  {durations.mean():.2f}s")
+        print(f"Total Duration: {durations.sum():.2f}s")
 
     # Group by Parameters
-    config_stats = defaultdict(lambda: {'scores': [], 'times': []})
-
-    for entry in valid_data:
-        params = entry.get('parameters', {})
-        param_key = tuple(sorted(params.items()))
-        
-        config_stats[param_key]['scores'].append(entry.get('total_score', 0))
-        
-        if '_duration' in entry:
-            config_stats[param_key]['times'].append(entry['_duration'])
-
-    # Process Aggregates
-    final_configs = []
-    for param_key, stats in config_stats.items():
-        avg_score = statistics.mean(stats['scores'])
-        avg_time = statistics.mean(stats['times']) if stats['times'] else float('inf')
-        count = len(stats['scores'])
-        final_configs.append({
-            'params': dict(param_key),
-            'avg_score': avg_score,
-            'avg_time': avg_time,
-            'count': count
-        })
+    df['_key'] = df['parameters'].map(lambda p: orjson.dumps(p, option=orjson.OPT_SORT_KEYS))
+    final_configs = df.groupby('_key', sort=False).agg(
+        params=('parameters', 'first'),
+        avg_score=('total_score', 'mean'),
+        avg_time=('_duration', 'mean'),
+        count=('total_score', 'size')
+    )
+    final_configs['params'] = final_configs['params'].map(lambda p: dict(sorted(p.items())))
 
     # top 3 score
-    final_configs.sort(key=lambda x: x['avg_score'], reverse=True)
-    
     print(f"\n{'-'*20}\nTOP 3 BY SCORE\n{'-'*20}")
-    for i, cfg in enumerate(final_configs[:3], 1):
-        time_str = f"{cfg['avg_time']:.2f}s" if cfg['avg_time'] != float('inf') else "N/A"
-        print(f"#{i} Score: {cfg['avg_score']:.2f} | Time: {time_str} | Samples: {cfg['count']}")
-        param_str = ", ".join([f"{k}={v}" for k, v in cfg['params'].items()])
+    for i, cfg in enumerate(final_configs.nlargest(3, 'avg_score').itertuples(), 1):
+        time_str = f"{cfg.avg_time:.2f}s" if not pd.isna(cfg.avg_time) else "N/A"
+        print(f"#{i} Score: {cfg.avg_score:.2f} | Time: {time_str} | Samples: {cfg.count}")
+        param_str = ", ".join([f"{k}={v}" for k, v in cfg.params.items()])
         print(f"   Params: {param_str}")
 
     # top 3 walltime
-    timed_configs = [c for c in final_configs if c['avg_time'] != float('inf')]
-    timed_configs.sort(key=lambda x: x['avg_time'])
+    timed_configs = final_configs.dropna(subset=['avg_time'])
 
     print(f"\n{'-'*20}\nTOP 3 BY TIME (FASTEST)\n{'-'*20}")
-    if not timed_configs:
+    if timed_configs.empty:
         print("Not enough data points to calculate per-run duration.")
     else:
-        for i, cfg in enumerate(timed_configs[:3], 1):
-            print(f"#{i} Time: {cfg['avg_time']:.2f}s | Score: {cfg['avg_score']:.2f} | Samples: {cfg['count']}")
-            param_str = ", ".join([f"{k}={v}" for k, v in cfg['params'].items()])
+        for i, cfg in enumerate(timed_configs.nsmallest(3, 'avg_time').itertuples(), 1):
+            print(f"#{i} Time: {cfg.avg_time:.2f}s | Score: {cfg.avg_score:.2f} | Samples: {cfg.count}")
+            param_str = ", ".join([f"{k}={v}" for k, v in cfg.params.items()])
             print(f"   Params: {param_str}")
 
 if __name__ == "__main__":
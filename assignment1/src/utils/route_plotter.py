@@ -1,5 +1,6 @@
+import numpy as np
 import plotly.express as px
-import pandas as pd
+import plotly.graph_objects as go
 
 
 def plot_route(
@@ -16,20 +17,37 @@ def plot_route(
     Vizualizes all days in the same plot with different colors.
     """
     
-    rows = []
-    for day, market_ids in tour.items():
-        for market_id in market_ids:
-            market = markets[str(market_id)]
-            rows.append({
-                "day": day,
-                "market_id": market_id,
-                "lat": market["latitude"],
-                "lon": market["longitude"],
-                "name": market["Name"],
-                "opens": market["Opens"],
-                "closes": market["Closes"],
-            })
-    df = pd.DataFrame(rows)
-            
-    fig = px.line_map(df, lat="lat", lon="lon", color="day", zoom=12, height=800, text="name")
-    fig.show()
\ No newline at end of file
+    # One line trace per day, built straight from coordinate arrays (no per-row DataFrame)
+    colors = px.colors.qualitative.Plotly
+    traces = []
+    all_lats, all_lons = [], []
+    for i, (day, market_ids) in enumerate(tour.items()):
+        day_markets = [markets[str(market_id)] for market_id in market_ids]
+        lats = np.fromiter((market["latitude"] for market in day_markets), float, count=len(day_markets))
+        lons = np.fromiter((market["longitude"] for market in day_markets), float, count=len(day_markets))
+        all_lats.append(lats)
+        all_lons.append(lons)
+        traces.append(go.Scattermap(
+            lat=lats,
+            lon=lons,
+            mode="lines+markers+text",
+            text=[market["Name"] for market in day_markets],
+            name=str(day),
+            legendgroup=str(day),
+            line=dict(color=colors[i % len(colors)]),
+            hovertemplate=f"day={day}<br>name=%{{text}}<br>lat=%{{lat}}<br>lon=%{{lon}}<extra></extra>",
+        ))
+    
+    fig = go.Figure(traces)
+    all_lats = np.concatenate(all_lats) if all_lats else np.empty(0)
+    all_lons = np.concatenate(all_lons) if all_lons else np.empty(0)
+    fig.update_layout(
+        map=dict(
+            center=dict(lat=all_lats.mean(), lon=all_lons.mean()) if all_lats.size else None,
+            zoom=12
+        ),
+        legend=dict(title=dict(text="day"), tracegroupgap=0),
+        margin=dict(t=60),
+        height=800,
+    )
+    fig.show()
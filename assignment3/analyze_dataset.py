@@ -15,9 +15,10 @@ def load_data():
     data = arff.loadarff(os.path.join(data_path, "credit-g.arff"))
     df = pd.DataFrame(data[0])
     
-    # Decode byte strings in object columns
+    # Decode byte strings in object columns and store them as categoricals
+    # (small integer codes instead of one Python string per cell)
     for col in df.select_dtypes([object]).columns:
-        df[col] = df[col].apply(lambda x: x.decode('utf-8') if isinstance(x, bytes) else x)
+        df[col] = df[col].str.decode('utf-8').astype('category')
     
     return df
 
@@ -39,10 +40,13 @@ def analyze_dataset_characteristics(df):
     # 2. ATTRIBUTE TYPES
     print("\n2. ATTRIBUTE TYPES")
     print("-" * 80)
-    print(f"\nData types:\n{df.dtypes.value_counts()}\n")
+    print(f"\nData types:\n{df.dtypes.astype(str).value_counts()}\n")
     
-    numerical_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-    categorical_cols = df.select_dtypes(include=[object]).columns.tolist()
+    # Numerical sub-frame and its values are materialized once and shared by all sections below
+    numerical_df = df.select_dtypes(include=[np.number])
+    numerical_cols = numerical_df.columns.tolist()
+    numerical_values = numerical_df.to_numpy()
+    categorical_cols = df.select_dtypes(include=['category']).columns.tolist()
     
     print(f"Numerical attributes ({len(numerical_cols)}): {numerical_cols}")
     print(f"\nCategorical attributes ({len(categorical_cols)}): {categorical_cols}")
@@ -52,7 +56,7 @@ def analyze_dataset_characteristics(df):
     for col in df.columns:
         unique_count = df[col].nunique()
         dtype = df[col].dtype
-        if dtype == 'object':
+        if isinstance(dtype, pd.CategoricalDtype):
             print(f"  {col}: Categorical/Nominal ({unique_count} unique values)")
         elif dtype in ['int64', 'float64']:
             if unique_count <= 10:
@@ -64,7 +68,7 @@ def analyze_dataset_characteristics(df):
     print("\n3. VALUE RANGES (Numerical Features)")
     print("-" * 80)
     if numerical_cols:
-        stats_df = df[numerical_cols].describe().T
+        stats_df = numerical_df.describe().T
         stats_df['range'] = stats_df['max'] - stats_df['min']
         print(stats_df[['min', 'max', 'range', 'mean', 'std']])
     
@@ -79,7 +83,7 @@ def analyze_dataset_characteristics(df):
     print("-" * 80)
     # For numerical columns, count zeros as potential sparse indicators
     if numerical_cols:
-        zero_counts = (df[numerical_cols] == 0).sum()
+        zero_counts = pd.Series(np.count_nonzero(numerical_values == 0, axis=0), index=numerical_cols)
         sparsity_pct = (zero_counts / len(df)) * 100
         sparsity_df = pd.DataFrame({
             'Zero Count': zero_counts,
@@ -107,33 +111,33 @@ def analyze_dataset_characteristics(df):
     print("\n6. OUTLIER DETECTION (IQR Method)")
     print("-" * 80)
     if numerical_cols:
-        outlier_summary = []
-        for col in numerical_cols:
-            Q1 = df[col].quantile(0.25)
-            Q3 = df[col].quantile(0.75)
-            IQR = Q3 - Q1
-            lower_bound = Q1 - 1.5 * IQR
-            upper_bound = Q3 + 1.5 * IQR
-            
-            outliers = df[(df[col] < lower_bound) | (df[col] > upper_bound)][col]
-            outlier_count = len(outliers)
-            outlier_pct = (outlier_count / len(df)) * 100
-            
-            outlier_summary.append({
-                'Feature': col,
-                'Lower Bound': lower_bound,
-                'Upper Bound': upper_bound,
-                'Outlier Count': outlier_count,
-                'Outlier %': outlier_pct
-            })
+        # Quartiles come from the describe() table above; one vectorized mask covers all columns
+        Q1 = stats_df['25%']
+        Q3 = stats_df['75%']
+        IQR = Q3 - Q1
+        lower_bounds = Q1 - 1.5 * IQR
+        upper_bounds = Q3 + 1.5 * IQR
         
-        outlier_df = pd.DataFrame(outlier_summary)
+        # Count-only comparison on the raw array (no aligned boolean DataFrames)
+        lower_bounds = lower_bounds.to_numpy()
+        upper_bounds = upper_bounds.to_numpy()
+        outlier_counts = np.count_nonzero(
+            (numerical_values < lower_bounds) | (numerical_values > upper_bounds), axis=0
+        )
+        
+        outlier_df = pd.DataFrame({
+            'Feature': numerical_cols,
+            'Lower Bound': lower_bounds,
+            'Upper Bound': upper_bounds,
+            'Outlier Count': outlier_counts,
+            'Outlier %': outlier_counts / len(df) * 100
+        })
         print(outlier_df[outlier_df['Outlier Count'] > 0].to_string(index=False))
         
         # Z-score method (alternative)
         print("\n   OUTLIERS (Z-Score > 3)")
         print("-" * 80)
-        z_scores = np.abs(stats.zscore(df[numerical_cols]))
+        z_scores = np.abs(stats.zscore(numerical_values, axis=0, nan_policy='omit'))
         outliers_zscore = (z_scores > 3).sum(axis=0)
         if outliers_zscore.sum() > 0:
             print(pd.DataFrame({
@@ -147,7 +151,7 @@ def analyze_dataset_characteristics(df):
     print("\n7. CORRELATION ANALYSIS")
     print("-" * 80)
     if numerical_cols and len(numerical_cols) > 1:
-        corr_matrix = df[numerical_cols].corr()
+        corr_matrix = numerical_df.corr()
         print("\nCorrelation Matrix:")
         print(corr_matrix)
         
@@ -5,13 +5,13 @@ Analyzes the German Credit dataset and generates provenance triples
 
 import pandas as pd
 import numpy as np
-from scipy.io import arff
 from scipy import stats
+from scipy.stats import gaussian_kde
 import os
+import re
+import uuid
 import datetime
-import json
-import matplotlib.pyplot as plt
-import seaborn as sns
+import orjson
 
 # Configuration
 executed_by = 'stud-id_12017067'
@@ -22,23 +22,156 @@ code_executor_role = 'code_executor'
 def now() -> str:
     """Returns the current time in ISO 8601 format with UTC timezone"""
     timestamp = datetime.datetime.now(datetime.timezone.utc)
-    timestamp_formated = timestamp.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
-    return timestamp_formated
+    return timestamp.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+# Qualified association of an activity with an agent in a given role
+ASSOCIATION_TEMPLATE = """\
+:{activity} prov:qualifiedAssociation :{uuid} .
+:{uuid} prov:agent :{agent} .
+:{uuid} rdf:type prov:Association .
+:{uuid} prov:hadRole :{role} ."""
+
+# Triples of a check activity: run by the executor and written by student A on the raw data,
+# generating a report entity
+CHECK_ACTIVITY_TEMPLATE = """\
+:{name} rdf:type prov:Activity .
+:{name} sc:isPartOf :data_analysis_phase .
+:{name} rdfs:comment "{title}" .
+:{name} rdfs:comment "{description}" .
+:{name} prov:startedAtTime "{start}"^^xsd:dateTime .
+:{name} prov:endedAtTime "{end}"^^xsd:dateTime .
+{associations}
+:{name} prov:used :raw_data .
+:{report} rdf:type prov:Entity .
+:{report} rdfs:comment "{report_comment}" .
+:{report} prov:wasGeneratedBy :{name} ."""
+
+# Triples of an inspect activity: student A looks at a report (and optionally derives a decision)
+INSPECT_ACTIVITY_TEMPLATE = """\
+:{name} rdf:type prov:Activity .
+:{name} rdfs:comment "{title}" .
+:{name} rdfs:comment "{description}" .
+:{name} prov:startedAtTime "{start}"^^xsd:dateTime .
+:{name} prov:endedAtTime "{end}"^^xsd:dateTime .
+{associations}
+:{name} prov:used :{used} ."""
+
+DECISION_TEMPLATE = """\
+:{decision} rdf:type prov:Entity .
+:{decision} rdfs:comment "{decision_comment}" .
+:{decision} prov:wasGeneratedBy :{name} ."""
+
+DATA_ANALYSIS_PHASE_TRIPLES = """\
+:data_analysis_phase rdf:type prov:Activity .
+:data_analysis_phase rdfs:label "Data Analysis Phase" .
+:data_analysis_phase rdfs:comment "Comprehensive analysis of the German Credit dataset characteristics" ."""
+
+# Hypotheses formulated from the value range, outlier, correlation and class distribution reports
+HYPOTHESES_TEMPLATE = """\
+:formulate_hypotheses rdf:type prov:Activity .
+:formulate_hypotheses sc:isPartOf :data_analysis_phase .
+:formulate_hypotheses rdfs:label "Formulate Hypotheses" .
+:formulate_hypotheses rdfs:comment "High-level hypotheses to guide SOM exploration" .
+:formulate_hypotheses prov:startedAtTime "{start}"^^xsd:dateTime .
+:formulate_hypotheses prov:endedAtTime "{end}"^^xsd:dateTime .
+:formulate_hypotheses prov:used :value_ranges_report .
+:formulate_hypotheses prov:used :outliers_report .
+:formulate_hypotheses prov:used :correlations_report .
+:formulate_hypotheses prov:used :class_distribution_report .
+:hypothesis_data_distribution rdf:type prov:Entity .
+:hypothesis_data_distribution rdfs:comment "{distribution}" .
+:hypothesis_data_distribution prov:wasGeneratedBy :formulate_hypotheses .
+:hypothesis_cluster_structure_simple rdf:type prov:Entity .
+:hypothesis_cluster_structure_simple rdfs:comment "{cluster_structure}" .
+:hypothesis_cluster_structure_simple prov:wasGeneratedBy :formulate_hypotheses .
+:hypothesis_class_balance rdf:type prov:Entity .
+:hypothesis_class_balance rdfs:comment "{class_balance}" .
+:hypothesis_class_balance prov:wasGeneratedBy :formulate_hypotheses ."""
+
+def association_triples(activity, uuid, agent, role):
+    """Triples of a qualified association (see ASSOCIATION_TEMPLATE) as one newline-joined string"""
+    return ASSOCIATION_TEMPLATE.format(activity=activity, uuid=uuid, agent=agent, role=role)
+
+def check_activity_triples(name, title, description, start, end, executor_uuid, writer_uuid, report, report_comment):
+    """Triples of a check activity (see CHECK_ACTIVITY_TEMPLATE) as one newline-joined string"""
+    associations = "\n".join((
+        association_triples(name, executor_uuid, executed_by, code_executor_role),
+        association_triples(name, writer_uuid, student_a, code_writer_role),
+    ))
+    return CHECK_ACTIVITY_TEMPLATE.format(
+        name=name, title=title, description=description, start=start, end=end,
+        associations=associations, report=report, report_comment=report_comment,
+    )
+
+def inspect_activity_triples(name, title, description, start, end, executor_uuid, used, decision=None, decision_comment=None):
+    """Triples of an inspect activity (see INSPECT_ACTIVITY_TEMPLATE) as one newline-joined string"""
+    template = INSPECT_ACTIVITY_TEMPLATE
+    if decision:
+        template += "\n" + DECISION_TEMPLATE
+    return template.format(
+        name=name, title=title, description=description, start=start, end=end,
+        associations=association_triples(name, executor_uuid, student_a, code_executor_role),
+        used=used, decision=decision, decision_comment=decision_comment,
+    )
+
+# Namespace for the association UUIDs, which are derived from the activity and role names
+ASSOCIATION_NAMESPACE = uuid.UUID("00000000-0000-0000-0000-000000000001")
+
+def activity_uuid(key):
+    """Deterministic UUID (uuid5) for a qualified association, e.g. activity_uuid("check_size_executor")"""
+    return str(uuid.uuid5(ASSOCIATION_NAMESPACE, key))
+
+ARFF_ATTRIBUTE = re.compile(r"@attribute\s+('[^']*'|\S+)\s+(.*)", re.IGNORECASE)
 
 def load_data():
-    """Load the credit-g dataset"""
+    """Load the credit-g dataset (from the pickled frame next to the ARFF if that is up to date)"""
     data_path = os.path.join("data")
-    data = arff.loadarff(os.path.join(data_path, "credit-g.arff"))
-    df = pd.DataFrame(data[0])
+    arff_file = os.path.join(data_path, "credit-g.arff")
+    cache_file = os.path.join(data_path, "credit-g.pkl")
+    # The cache is stale if the ARFF or this loader changed since it was written
+    source_mtime = max(os.path.getmtime(arff_file), os.path.getmtime(__file__))
+    if os.path.exists(cache_file) and os.path.getmtime(cache_file) >= source_mtime:
+        return pd.read_pickle(cache_file)
     
-    # Decode byte strings in object columns
-    for col in df.select_dtypes([object]).columns:
-        df[col] = df[col].apply(lambda x: x.decode('utf-8') if isinstance(x, bytes) else x)
+    # Column names and types come from the ARFF header; the data section is plain CSV
+    # (with single-quoted values), so it is parsed by the pandas C parser directly
+    names, dtypes = [], {}
+    with open(arff_file, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line.lower().startswith("@data"):
+                break
+            match = ARFF_ATTRIBUTE.match(line)
+            if match:
+                name = match.group(1).strip("'")
+                names.append(name)
+                dtypes[name] = np.float64 if match.group(2).lower() in ("real", "numeric", "integer") else object
+        df = pd.read_csv(f, names=names, dtype=dtypes, quotechar="'", skipinitialspace=True,
+                         comment="%", keep_default_na=False, na_values=["?"])
+    
+    # Nominal columns as categoricals: integer codes instead of one Python string per cell
+    df = df.astype({col: "category" for col in df.select_dtypes([object]).columns})
+    
+    try:
+        df.to_pickle(cache_file)
+    except OSError:
+        # Read-only data directory: just skip the cache
+        pass
     
     return df
 
-# Storage for all provenance triples
-all_provenance_triples = []
+# Provenance triples are streamed to a temp file as they are generated and moved
+# into place once the analysis completes (no partial output on failure)
+TRIPLES_FILE = 'data/analysis_provenance_triples.txt'
+triples_out = open(TRIPLES_FILE + '.tmp', 'w', buffering=1 << 20)
+num_provenance_triples = 0
+
+def emit_triples(block):
+    """Append a block of triples (one per line, newline-joined) to the provenance output."""
+    global num_provenance_triples
+    triples_out.write(block)
+    triples_out.write("\n")
+    num_provenance_triples += block.count("\n") + 1
 
 print("=" * 80)
 print("GERMAN CREDIT DATASET - ANALYSIS WITH PROVENANCE DOCUMENTATION")
@@ -47,13 +180,18 @@ print("=" * 80)
 # Load data
 df = load_data()
 
+# Column classification shared by all analysis steps (computed once)
+numerical_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+categorical_cols = df.select_dtypes(include=["category"]).columns.tolist()
+unique_counts = df.nunique()
+# Numerical attributes as one float32 matrix shared by the range, outlier and correlation steps
+# (credit-g's numerical attributes are small integers, so float32 holds them exactly;
+# means/stds/correlations still accumulate in float64)
+numerical_values = df[numerical_cols].to_numpy(dtype=np.float32)
+missing_counts = df.isna().sum()
+
 # Create data analysis phase activity
-data_analysis_phase = [
-    ':data_analysis_phase rdf:type prov:Activity .',
-    ':data_analysis_phase rdfs:label "Data Analysis Phase" .',
-    ':data_analysis_phase rdfs:comment "Comprehensive analysis of the German Credit dataset characteristics" .',
-]
-all_provenance_triples.extend(data_analysis_phase)
+emit_triples(DATA_ANALYSIS_PHASE_TRIPLES)
 
 #############################################
 # 1) SIZE ANALYSIS
@@ -72,47 +210,26 @@ print(f"Data size: {data_size_report}")
 end_time_data_size = now()
 
 # Activity: Check and create report
-check_size_uuid_executor = "9f0dc14f-b18c-462c-97d0-e7582aaf19db"
-check_size_uuid_writer = "66f0171b-eef4-4a71-b878-b28fea0a0133"
-
-check_size_activity = [
-    ':check_size rdf:type prov:Activity .',
-    ':check_size sc:isPartOf :data_analysis_phase .',
-    ':check_size rdfs:comment "Check data size" .',
-    ':check_size rdfs:comment "Inspect the shape of the loaded dataset to determine the number of records and features." .',
-    f':check_size prov:startedAtTime "{start_time_data_size}"^^xsd:dateTime .',
-    f':check_size prov:endedAtTime "{end_time_data_size}"^^xsd:dateTime .',
-    f':check_size prov:qualifiedAssociation :{check_size_uuid_executor} .',
-    f':{check_size_uuid_executor} prov:agent :{executed_by} .',
-    f':{check_size_uuid_executor} rdf:type prov:Association .',
-    f':{check_size_uuid_executor} prov:hadRole :{code_executor_role} .',
-    f':check_size prov:qualifiedAssociation :{check_size_uuid_writer} .',
-    f':{check_size_uuid_writer} prov:agent :{student_a} .',
-    f':{check_size_uuid_writer} rdf:type prov:Association .',
-    f':{check_size_uuid_writer} prov:hadRole :{code_writer_role} .',
-    ':check_size prov:used :raw_data .',
-    ':check_size_report rdf:type prov:Entity .',
-    f':check_size_report rdfs:comment "Dataset contains {data_size_report["rows"]} rows and {data_size_report["columns"]} columns" .',
-    ':check_size_report prov:wasGeneratedBy :check_size .',
-]
-all_provenance_triples.extend(check_size_activity)
+check_size_uuid_executor = activity_uuid("check_size_executor")
+check_size_uuid_writer = activity_uuid("check_size_writer")
+
+check_size_activity = check_activity_triples(
+    "check_size", "Check data size",
+    "Inspect the shape of the loaded dataset to determine the number of records and features.",
+    start_time_data_size, end_time_data_size, check_size_uuid_executor, check_size_uuid_writer,
+    "check_size_report", f'Dataset contains {data_size_report["rows"]} rows and {data_size_report["columns"]} columns',
+)
+emit_triples(check_size_activity)
 
 # Inspect activity outcome and derive decisions
-insp_size_uuid_executor = "d3f5e1b3-4f3a-4e2e-9a1b-8c4f2c3b5e6f"
-
-inspect_size_report_activity = [
-    ':inspect_size_report rdf:type prov:Activity .',
-    ':inspect_size_report rdfs:comment "Inspect the dataset size" .',
-    f':inspect_size_report rdfs:comment "The dataset contains {data_size_report["rows"]} rows and {data_size_report["columns"]} dimensions of which one is the target variable. Dataset size is manageable for SOM training without subsampling." .',
-    f':inspect_size_report prov:startedAtTime "{start_time_data_size}"^^xsd:dateTime .',
-    f':inspect_size_report prov:endedAtTime "{end_time_data_size}"^^xsd:dateTime .',
-    f':inspect_size_report prov:qualifiedAssociation :{insp_size_uuid_executor} .',
-    f':{insp_size_uuid_executor} prov:agent :{student_a} .',
-    f':{insp_size_uuid_executor} rdf:type prov:Association .',
-    f':{insp_size_uuid_executor} prov:hadRole :{code_executor_role} .',
-    ':inspect_size_report prov:used :check_size_report .',
-]
-all_provenance_triples.extend(inspect_size_report_activity)
+insp_size_uuid_executor = activity_uuid("insp_size_executor")
+
+inspect_size_report_activity = inspect_activity_triples(
+    "inspect_size_report", "Inspect the dataset size",
+    f'The dataset contains {data_size_report["rows"]} rows and {data_size_report["columns"]} dimensions of which one is the target variable. Dataset size is manageable for SOM training without subsampling.',
+    start_time_data_size, end_time_data_size, insp_size_uuid_executor, "check_size_report",
+)
+emit_triples(inspect_size_report_activity)
 
 #############################################
 # 2) ATTRIBUTE TYPES ANALYSIS
@@ -121,16 +238,13 @@ print("\n" + "=" * 80)
 print("2. ATTRIBUTE TYPES ANALYSIS")
 print("=" * 80)
 
-def get_attribute_types(df):
+def get_attribute_types(df, numerical_cols, categorical_cols, unique_counts):
     """Analyze attribute types"""
-    numerical_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-    categorical_cols = df.select_dtypes(include=[object]).columns.tolist()
-    
     type_details = {}
-    for col in df.columns:
-        unique_count = df[col].nunique()
-        dtype = str(df[col].dtype)
-        if dtype == 'object':
+    for col, dtype in df.dtypes.items():
+        unique_count = int(unique_counts[col])
+        dtype = str(dtype)
+        if dtype == 'category':
             type_details[col] = {"type": "categorical", "unique_values": unique_count}
         elif dtype in ['int64', 'float64']:
             if unique_count <= 10:
@@ -145,56 +259,33 @@ def get_attribute_types(df):
     }
 
 start_time_attr_types = now()
-attr_types_report = get_attribute_types(df)
+attr_types_report = get_attribute_types(df, numerical_cols, categorical_cols, unique_counts)
 print(f"Numerical attributes: {attr_types_report['numerical_count']}")
 print(f"Categorical attributes: {attr_types_report['categorical_count']}")
 end_time_attr_types = now()
 
 # Activity: Analyze attribute types
-check_types_uuid_executor = "a1b2c3d4-e5f6-4a7b-8c9d-0e1f2a3b4c5d"
-check_types_uuid_writer = "b2c3d4e5-f6a7-4b8c-9d0e-1f2a3b4c5d6e"
-
-check_types_activity = [
-    ':check_attribute_types rdf:type prov:Activity .',
-    ':check_attribute_types sc:isPartOf :data_analysis_phase .',
-    ':check_attribute_types rdfs:comment "Analyze attribute types" .',
-    ':check_attribute_types rdfs:comment "Classify each feature as numerical (continuous/discrete) or categorical to understand data structure." .',
-    f':check_attribute_types prov:startedAtTime "{start_time_attr_types}"^^xsd:dateTime .',
-    f':check_attribute_types prov:endedAtTime "{end_time_attr_types}"^^xsd:dateTime .',
-    f':check_attribute_types prov:qualifiedAssociation :{check_types_uuid_executor} .',
-    f':{check_types_uuid_executor} prov:agent :{executed_by} .',
-    f':{check_types_uuid_executor} rdf:type prov:Association .',
-    f':{check_types_uuid_executor} prov:hadRole :{code_executor_role} .',
-    f':check_attribute_types prov:qualifiedAssociation :{check_types_uuid_writer} .',
-    f':{check_types_uuid_writer} prov:agent :{student_a} .',
-    f':{check_types_uuid_writer} rdf:type prov:Association .',
-    f':{check_types_uuid_writer} prov:hadRole :{code_writer_role} .',
-    ':check_attribute_types prov:used :raw_data .',
-    ':attribute_types_report rdf:type prov:Entity .',
-    f':attribute_types_report rdfs:comment "Found {attr_types_report["numerical_count"]} numerical and {attr_types_report["categorical_count"]} categorical attributes" .',
-    ':attribute_types_report prov:wasGeneratedBy :check_attribute_types .',
-]
-all_provenance_triples.extend(check_types_activity)
+check_types_uuid_executor = activity_uuid("check_types_executor")
+check_types_uuid_writer = activity_uuid("check_types_writer")
+
+check_types_activity = check_activity_triples(
+    "check_attribute_types", "Analyze attribute types",
+    "Classify each feature as numerical (continuous/discrete) or categorical to understand data structure.",
+    start_time_attr_types, end_time_attr_types, check_types_uuid_executor, check_types_uuid_writer,
+    "attribute_types_report", f'Found {attr_types_report["numerical_count"]} numerical and {attr_types_report["categorical_count"]} categorical attributes',
+)
+emit_triples(check_types_activity)
 
 # Inspect attribute types
-insp_types_uuid_executor = "c3d4e5f6-a7b8-4c9d-0e1f-2a3b4c5d6e7f"
-
-inspect_types_activity = [
-    ':inspect_attribute_types rdf:type prov:Activity .',
-    ':inspect_attribute_types rdfs:comment "Inspect attribute types distribution" .',
-    f':inspect_attribute_types rdfs:comment "Dataset has mixed types with {attr_types_report["numerical_count"]} numerical and {attr_types_report["categorical_count"]} categorical features. Categorical features will require encoding for SOM training." .',
-    f':inspect_attribute_types prov:startedAtTime "{start_time_attr_types}"^^xsd:dateTime .',
-    f':inspect_attribute_types prov:endedAtTime "{end_time_attr_types}"^^xsd:dateTime .',
-    f':inspect_attribute_types prov:qualifiedAssociation :{insp_types_uuid_executor} .',
-    f':{insp_types_uuid_executor} prov:agent :{student_a} .',
-    f':{insp_types_uuid_executor} rdf:type prov:Association .',
-    f':{insp_types_uuid_executor} prov:hadRole :{code_executor_role} .',
-    ':inspect_attribute_types prov:used :attribute_types_report .',
-    ':decision_encode_categorical rdf:type prov:Entity .',
-    ':decision_encode_categorical rdfs:comment "Decision: Apply ordinal encoding to categorical variables preserving meaningful order where applicable" .',
-    ':decision_encode_categorical prov:wasGeneratedBy :inspect_attribute_types .',
-]
-all_provenance_triples.extend(inspect_types_activity)
+insp_types_uuid_executor = activity_uuid("insp_types_executor")
+
+inspect_types_activity = inspect_activity_triples(
+    "inspect_attribute_types", "Inspect attribute types distribution",
+    f'Dataset has mixed types with {attr_types_report["numerical_count"]} numerical and {attr_types_report["categorical_count"]} categorical features. Categorical features will require encoding for SOM training.',
+    start_time_attr_types, end_time_attr_types, insp_types_uuid_executor, "attribute_types_report",
+    decision="decision_encode_categorical", decision_comment="Decision: Apply ordinal encoding to categorical variables preserving meaningful order where applicable",
+)
+emit_triples(inspect_types_activity)
 
 #############################################
 # 3) VALUE RANGES ANALYSIS
@@ -203,72 +294,54 @@ print("\n" + "=" * 80)
 print("3. VALUE RANGES ANALYSIS")
 print("=" * 80)
 
-def get_value_ranges(df):
-    """Analyze value ranges for numerical features"""
-    numerical_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+def get_value_ranges(numerical_cols, values):
+    """Analyze value ranges for numerical features (values: rows x numerical_cols matrix)"""
+    mins = np.nanmin(values, axis=0).astype(np.float64)
+    maxs = np.nanmax(values, axis=0).astype(np.float64)
+    means = np.nanmean(values, axis=0, dtype=np.float64)
+    # Sample std from float64 deviations (np.nanstd would subtract the mean in float32 in place)
+    deviations = values - means
+    stds = np.sqrt(np.nansum(deviations * deviations, axis=0) / (np.count_nonzero(~np.isnan(values), axis=0) - 1))
     ranges = {}
-    for col in numerical_cols:
+    for col, col_min, col_max, mean, std in zip(numerical_cols, mins, maxs, means, stds):
         ranges[col] = {
-            "min": float(df[col].min()),
-            "max": float(df[col].max()),
-            "range": float(df[col].max() - df[col].min()),
-            "mean": float(df[col].mean()),
-            "std": float(df[col].std())
+            "min": float(col_min),
+            "max": float(col_max),
+            "range": float(col_max - col_min),
+            "mean": float(mean),
+            "std": float(std)
         }
     return ranges
 
 start_time_ranges = now()
-ranges_report = get_value_ranges(df)
+ranges_report = get_value_ranges(numerical_cols, numerical_values)
 print(f"Analyzed value ranges for {len(ranges_report)} numerical features")
 for col, stats in ranges_report.items():
     print(f"  {col}: [{stats['min']:.2f}, {stats['max']:.2f}], range={stats['range']:.2f}")
 end_time_ranges = now()
 
 # Activity: Analyze value ranges
-check_ranges_uuid_executor = "d4e5f6a7-b8c9-4d0e-1f2a-3b4c5d6e7f8a"
-check_ranges_uuid_writer = "e5f6a7b8-c9d0-4e1f-2a3b-4c5d6e7f8a9b"
-
-check_ranges_activity = [
-    ':check_value_ranges rdf:type prov:Activity .',
-    ':check_value_ranges sc:isPartOf :data_analysis_phase .',
-    ':check_value_ranges rdfs:comment "Analyze value ranges" .',
-    ':check_value_ranges rdfs:comment "Determine min, max, and range for numerical features to understand data distribution and scaling needs." .',
-    f':check_value_ranges prov:startedAtTime "{start_time_ranges}"^^xsd:dateTime .',
-    f':check_value_ranges prov:endedAtTime "{end_time_ranges}"^^xsd:dateTime .',
-    f':check_value_ranges prov:qualifiedAssociation :{check_ranges_uuid_executor} .',
-    f':{check_ranges_uuid_executor} prov:agent :{executed_by} .',
-    f':{check_ranges_uuid_executor} rdf:type prov:Association .',
-    f':{check_ranges_uuid_executor} prov:hadRole :{code_executor_role} .',
-    f':check_value_ranges prov:qualifiedAssociation :{check_ranges_uuid_writer} .',
-    f':{check_ranges_uuid_writer} prov:agent :{student_a} .',
-    f':{check_ranges_uuid_writer} rdf:type prov:Association .',
-    f':{check_ranges_uuid_writer} prov:hadRole :{code_writer_role} .',
-    ':check_value_ranges prov:used :raw_data .',
-    ':value_ranges_report rdf:type prov:Entity .',
-    f':value_ranges_report rdfs:comment "Analyzed ranges for {len(ranges_report)} numerical features with varying scales" .',
-    ':value_ranges_report prov:wasGeneratedBy :check_value_ranges .',
-]
-all_provenance_triples.extend(check_ranges_activity)
+check_ranges_uuid_executor = activity_uuid("check_ranges_executor")
+check_ranges_uuid_writer = activity_uuid("check_ranges_writer")
+
+check_ranges_activity = check_activity_triples(
+    "check_value_ranges", "Analyze value ranges",
+    "Determine min, max, and range for numerical features to understand data distribution and scaling needs.",
+    start_time_ranges, end_time_ranges, check_ranges_uuid_executor, check_ranges_uuid_writer,
+    "value_ranges_report", f'Analyzed ranges for {len(ranges_report)} numerical features with varying scales',
+)
+emit_triples(check_ranges_activity)
 
 # Inspect value ranges
-insp_ranges_uuid_executor = "f6a7b8c9-d0e1-4f2a-3b4c-5d6e7f8a9b0c"
-
-inspect_ranges_activity = [
-    ':inspect_value_ranges rdf:type prov:Activity .',
-    ':inspect_value_ranges rdfs:comment "Inspect value ranges" .',
-    ':inspect_value_ranges rdfs:comment "Features have different scales (e.g., age 19-75, credit_amount 250-18424, duration 4-72). Different scales require normalization for SOM training to prevent features with larger ranges from dominating distance calculations." .',
-    f':inspect_value_ranges prov:startedAtTime "{start_time_ranges}"^^xsd:dateTime .',
-    f':inspect_value_ranges prov:endedAtTime "{end_time_ranges}"^^xsd:dateTime .',
-    f':inspect_value_ranges prov:qualifiedAssociation :{insp_ranges_uuid_executor} .',
-    f':{insp_ranges_uuid_executor} prov:agent :{student_a} .',
-    f':{insp_ranges_uuid_executor} rdf:type prov:Association .',
-    f':{insp_ranges_uuid_executor} prov:hadRole :{code_executor_role} .',
-    ':inspect_value_ranges prov:used :value_ranges_report .',
-    ':decision_normalize_data rdf:type prov:Entity .',
-    ':decision_normalize_data rdfs:comment "Decision: Apply MinMax scaling to normalize all features to [0,1] range for fair distance computation in SOM" .',
-    ':decision_normalize_data prov:wasGeneratedBy :inspect_value_ranges .',
-]
-all_provenance_triples.extend(inspect_ranges_activity)
+insp_ranges_uuid_executor = activity_uuid("insp_ranges_executor")
+
+inspect_ranges_activity = inspect_activity_triples(
+    "inspect_value_ranges", "Inspect value ranges",
+    "Features have different scales (e.g., age 19-75, credit_amount 250-18424, duration 4-72). Different scales require normalization for SOM training to prevent features with larger ranges from dominating distance calculations.",
+    start_time_ranges, end_time_ranges, insp_ranges_uuid_executor, "value_ranges_report",
+    decision="decision_normalize_data", decision_comment="Decision: Apply MinMax scaling to normalize all features to [0,1] range for fair distance computation in SOM",
+)
+emit_triples(inspect_ranges_activity)
 
 #############################################
 # 4) MISSING VALUES ANALYSIS
@@ -277,10 +350,9 @@ print("\n" + "=" * 80)
 print("4. MISSING VALUES ANALYSIS")
 print("=" * 80)
 
-def check_missing_values(df):
-    """Check for missing values"""
-    missing = df.isnull().sum()
-    missing_pct = (missing / len(df)) * 100
+def check_missing_values(missing, num_rows):
+    """Check for missing values (from the per-column missing counts)"""
+    missing_pct = (missing / num_rows) * 100
     return {
         "total_missing": int(missing.sum()),
         "columns_with_missing": list(missing[missing > 0].index),
@@ -288,54 +360,33 @@ def check_missing_values(df):
     }
 
 start_time_missing = now()
-missing_report = check_missing_values(df)
+missing_report = check_missing_values(missing_counts, len(df))
 print(f"Total missing values: {missing_report['total_missing']}")
 if missing_report['total_missing'] == 0:
     print("✓ No missing values detected in the dataset")
 end_time_missing = now()
 
 # Activity: Check missing values
-check_missing_uuid_executor = "a7b8c9d0-e1f2-4a3b-4c5d-6e7f8a9b0c1d"
-check_missing_uuid_writer = "b8c9d0e1-f2a3-4b4c-5d6e-7f8a9b0c1d2e"
-
-check_missing_activity = [
-    ':check_missing_values rdf:type prov:Activity .',
-    ':check_missing_values sc:isPartOf :data_analysis_phase .',
-    ':check_missing_values rdfs:comment "Check for missing values" .',
-    ':check_missing_values rdfs:comment "Identify any missing or null values in the dataset that may require imputation or removal." .',
-    f':check_missing_values prov:startedAtTime "{start_time_missing}"^^xsd:dateTime .',
-    f':check_missing_values prov:endedAtTime "{end_time_missing}"^^xsd:dateTime .',
-    f':check_missing_values prov:qualifiedAssociation :{check_missing_uuid_executor} .',
-    f':{check_missing_uuid_executor} prov:agent :{executed_by} .',
-    f':{check_missing_uuid_executor} rdf:type prov:Association .',
-    f':{check_missing_uuid_executor} prov:hadRole :{code_executor_role} .',
-    f':check_missing_values prov:qualifiedAssociation :{check_missing_uuid_writer} .',
-    f':{check_missing_uuid_writer} prov:agent :{student_a} .',
-    f':{check_missing_uuid_writer} rdf:type prov:Association .',
-    f':{check_missing_uuid_writer} prov:hadRole :{code_writer_role} .',
-    ':check_missing_values prov:used :raw_data .',
-    ':missing_values_report rdf:type prov:Entity .',
-    f':missing_values_report rdfs:comment "Found {missing_report["total_missing"]} missing values in dataset" .',
-    ':missing_values_report prov:wasGeneratedBy :check_missing_values .',
-]
-all_provenance_triples.extend(check_missing_activity)
+check_missing_uuid_executor = activity_uuid("check_missing_executor")
+check_missing_uuid_writer = activity_uuid("check_missing_writer")
+
+check_missing_activity = check_activity_triples(
+    "check_missing_values", "Check for missing values",
+    "Identify any missing or null values in the dataset that may require imputation or removal.",
+    start_time_missing, end_time_missing, check_missing_uuid_executor, check_missing_uuid_writer,
+    "missing_values_report", f'Found {missing_report["total_missing"]} missing values in dataset',
+)
+emit_triples(check_missing_activity)
 
 # Inspect missing values
-insp_missing_uuid_executor = "c9d0e1f2-a3b4-4c5d-6e7f-8a9b0c1d2e3f"
-
-inspect_missing_activity = [
-    ':inspect_missing_values rdf:type prov:Activity .',
-    ':inspect_missing_values rdfs:comment "Inspect missing values" .',
-    ':inspect_missing_values rdfs:comment "No missing values detected in the dataset. Data is complete and ready for analysis without imputation." .',
-    f':inspect_missing_values prov:startedAtTime "{start_time_missing}"^^xsd:dateTime .',
-    f':inspect_missing_values prov:endedAtTime "{end_time_missing}"^^xsd:dateTime .',
-    f':inspect_missing_values prov:qualifiedAssociation :{insp_missing_uuid_executor} .',
-    f':{insp_missing_uuid_executor} prov:agent :{student_a} .',
-    f':{insp_missing_uuid_executor} rdf:type prov:Association .',
-    f':{insp_missing_uuid_executor} prov:hadRole :{code_executor_role} .',
-    ':inspect_missing_values prov:used :missing_values_report .',
-]
-all_provenance_triples.extend(inspect_missing_activity)
+insp_missing_uuid_executor = activity_uuid("insp_missing_executor")
+
+inspect_missing_activity = inspect_activity_triples(
+    "inspect_missing_values", "Inspect missing values",
+    "No missing values detected in the dataset. Data is complete and ready for analysis without imputation.",
+    start_time_missing, end_time_missing, insp_missing_uuid_executor, "missing_values_report",
+)
+emit_triples(inspect_missing_activity)
 
 #############################################
 # 5) OUTLIER DETECTION
@@ -344,8 +395,27 @@ print("\n" + "=" * 80)
 print("5. OUTLIER DETECTION (IQR Method)")
 print("=" * 80)
 
+def quartiles(values):
+    """Column-wise Q1/Q3 of a 2D array (linear interpolation, same values as np.percentile).
+
+    Only the four order statistics around each quartile are selected with np.partition
+    (introselect, O(n) per column) instead of sorting; columns with NaNs fall back to nanpercentile.
+    """
+    if np.isnan(values).any():
+        return np.nanpercentile(values, [25, 75], axis=0)
+    positions = np.array([0.25, 0.75]) * (len(values) - 1)
+    below = np.floor(positions).astype(int)
+    above = np.minimum(below + 1, len(values) - 1)
+    parts = np.partition(values, np.unique(np.concatenate([below, above])), axis=0)
+    lo, hi = parts[below], parts[above]
+    weight = (positions - below)[:, None]
+    # Interpolate from the nearer neighbour, as np.percentile does
+    return np.where(weight < 0.5, lo + (hi - lo) * weight, hi - (hi - lo) * (1 - weight))
+
 def detect_outliers_iqr(
     df,
+    numerical_cols,
+    values,
     plot: bool = True,
     save_dir: str | None = os.path.join("pics", "outliers"),
     show: bool = False,
@@ -355,6 +425,8 @@ def detect_outliers_iqr(
 
     Parameters:
     - df: Input DataFrame
+    - numerical_cols: Numerical columns to check
+    - values: Matrix of the numerical columns (rows x numerical_cols)
     - plot: If True, generate plots for columns with outliers
     - save_dir: Directory to save plots (created if missing). Defaults to pics/outliers
     - show: If True, display plots interactively
@@ -363,7 +435,6 @@ def detect_outliers_iqr(
     Returns:
     - Dict with per-column outlier summary (count, percentage, bounds, plot_path)
     """
-    numerical_cols = df.select_dtypes(include=[np.number]).columns.tolist()
     outlier_summary = {}
 
     # Prepare plotting directory if plotting is enabled
@@ -371,21 +442,27 @@ def detect_outliers_iqr(
     if plot and save_dir:
         os.makedirs(save_dir, exist_ok=True)
 
-    for col in numerical_cols:
-        Q1 = df[col].quantile(0.25)
-        Q3 = df[col].quantile(0.75)
-        IQR = Q3 - Q1
-
-        # Skip plotting for non-varying columns
-        if IQR == 0:
-            lower_bound = Q1
-            upper_bound = Q3
-        else:
-            lower_bound = Q1 - 1.5 * IQR
-            upper_bound = Q3 + 1.5 * IQR
-
-        outliers = df[(df[col] < lower_bound) | (df[col] > upper_bound)][col]
-        outlier_count = len(outliers)
+    # Plotting libraries are only imported when needed (they dominate the script's startup time)
+    fig = None
+    if plot:
+        import matplotlib
+        if not show:
+            matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+
+        # One figure is reused (cleared) for all plotted columns
+        fig, axes = plt.subplots(1, 2, figsize=(11, 4))
+
+    # Bounds and outlier counts for all columns at once (non-varying columns get IQR 0, i.e. bounds Q1/Q3)
+    Q1, Q3 = quartiles(values)
+    IQR = Q3 - Q1
+    lower_bounds = Q1 - 1.5 * IQR
+    upper_bounds = Q3 + 1.5 * IQR
+    # lower <= upper, so the two sides are disjoint and can be counted separately (no OR pass)
+    outlier_counts = np.count_nonzero(values < lower_bounds, axis=0) + np.count_nonzero(values > upper_bounds, axis=0)
+
+    for col, lower_bound, upper_bound, outlier_count in zip(numerical_cols, lower_bounds, upper_bounds, outlier_counts):
         outlier_pct = (outlier_count / len(df)) * 100
 
         if outlier_count > 0:
@@ -399,7 +476,8 @@ def detect_outliers_iqr(
             # Generate plots for detailed inspection
             plot_path = None
             if plot and plots_done < max_plots:
-                fig, axes = plt.subplots(1, 2, figsize=(11, 4))
+                for ax in axes:
+                    ax.clear()
                 fig.suptitle(f"Outliers in {col}: {outlier_count} ({outlier_pct:.2f}%)")
 
                 # Boxplot with bounds
@@ -409,8 +487,17 @@ def detect_outliers_iqr(
                 axes[0].set_title(f"Boxplot: {col}")
                 axes[0].legend(loc="best")
 
-                # Histogram/KDE with bounds
-                sns.histplot(df[col], kde=True, ax=axes[1], color="#4c72b0")
+                # Histogram/KDE with bounds (fixed 30 bins; KDE evaluated once on a coarse grid and scaled to counts)
+                col_values = df[col].dropna().to_numpy(dtype=np.float64)
+                counts, bin_edges = np.histogram(col_values, bins=30)
+                axes[1].bar(bin_edges[:-1], counts, width=np.diff(bin_edges), align="edge",
+                            color=(0.298, 0.447, 0.690, 0.5), edgecolor="black")
+                if np.ptp(col_values) > 0:
+                    grid = np.linspace(col_values.min(), col_values.max(), 100)
+                    density = gaussian_kde(col_values).evaluate(grid)
+                    axes[1].plot(grid, density * len(col_values) * (bin_edges[1] - bin_edges[0]), color="#4c72b0")
+                axes[1].set_xlabel(col)
+                axes[1].set_ylabel("Count")
                 axes[1].axvline(lower_bound, color="red", linestyle="--", linewidth=1)
                 axes[1].axvline(upper_bound, color="red", linestyle="--", linewidth=1)
                 axes[1].set_title(f"Distribution: {col}")
@@ -422,7 +509,6 @@ def detect_outliers_iqr(
                     fig.savefig(plot_path, dpi=150)
                 if show:
                     plt.show()
-                plt.close(fig)
                 plots_done += 1
 
             if plot_path:
@@ -430,62 +516,42 @@ def detect_outliers_iqr(
 
             outlier_summary[col] = entry
 
+    if fig is not None:
+        plt.close(fig)
+
     return outlier_summary
 
 start_time_outliers = now()
-outliers_report = detect_outliers_iqr(df)
+outliers_report = detect_outliers_iqr(df, numerical_cols, numerical_values)
 print(f"Features with outliers: {len(outliers_report)}")
 for col, stats in outliers_report.items():
     print(f"  {col}: {stats['count']} outliers ({stats['percentage']:.2f}%)")
 end_time_outliers = now()
 
 # Activity: Detect outliers
-check_outliers_uuid_executor = "d0e1f2a3-b4c5-4d6e-7f8a-9b0c1d2e3f4a"
-check_outliers_uuid_writer = "e1f2a3b4-c5d6-4e7f-8a9b-0c1d2e3f4a5b"
-
-check_outliers_activity = [
-    ':check_outliers rdf:type prov:Activity .',
-    ':check_outliers sc:isPartOf :data_analysis_phase .',
-    ':check_outliers rdfs:comment "Detect outliers using IQR method" .',
-    ':check_outliers rdfs:comment "Apply IQR-based outlier detection to identify anomalous values that may affect SOM training." .',
-    f':check_outliers prov:startedAtTime "{start_time_outliers}"^^xsd:dateTime .',
-    f':check_outliers prov:endedAtTime "{end_time_outliers}"^^xsd:dateTime .',
-    f':check_outliers prov:qualifiedAssociation :{check_outliers_uuid_executor} .',
-    f':{check_outliers_uuid_executor} prov:agent :{executed_by} .',
-    f':{check_outliers_uuid_executor} rdf:type prov:Association .',
-    f':{check_outliers_uuid_executor} prov:hadRole :{code_executor_role} .',
-    f':check_outliers prov:qualifiedAssociation :{check_outliers_uuid_writer} .',
-    f':{check_outliers_uuid_writer} prov:agent :{student_a} .',
-    f':{check_outliers_uuid_writer} rdf:type prov:Association .',
-    f':{check_outliers_uuid_writer} prov:hadRole :{code_writer_role} .',
-    ':check_outliers prov:used :raw_data .',
-    ':outliers_report rdf:type prov:Entity .',
-    f':outliers_report rdfs:comment "Detected outliers in {len(outliers_report)} features using IQR method" .',
-    ':outliers_report prov:wasGeneratedBy :check_outliers .',
-]
-all_provenance_triples.extend(check_outliers_activity)
+check_outliers_uuid_executor = activity_uuid("check_outliers_executor")
+check_outliers_uuid_writer = activity_uuid("check_outliers_writer")
+
+check_outliers_activity = check_activity_triples(
+    "check_outliers", "Detect outliers using IQR method",
+    "Apply IQR-based outlier detection to identify anomalous values that may affect SOM training.",
+    start_time_outliers, end_time_outliers, check_outliers_uuid_executor, check_outliers_uuid_writer,
+    "outliers_report", f'Detected outliers in {len(outliers_report)} features using IQR method',
+)
+emit_triples(check_outliers_activity)
 
 # Inspect outliers
-insp_outliers_uuid_executor = "f2a3b4c5-d6e7-4f8a-9b0c-1d2e3f4a5b6c"
+insp_outliers_uuid_executor = activity_uuid("insp_outliers_executor")
 
 outlier_interpretation = "Outliers detected in several features. For credit risk data, these may represent legitimate extreme cases (e.g., very high credit amounts, long durations). SOMs are relatively robust to outliers as they perform vector quantization. Decision: Keep outliers as they may represent important edge cases in credit assessment."
 
-inspect_outliers_activity = [
-    ':inspect_outliers rdf:type prov:Activity .',
-    ':inspect_outliers rdfs:comment "Inspect outlier detection results" .',
-    f':inspect_outliers rdfs:comment "{outlier_interpretation}" .',
-    f':inspect_outliers prov:startedAtTime "{start_time_outliers}"^^xsd:dateTime .',
-    f':inspect_outliers prov:endedAtTime "{end_time_outliers}"^^xsd:dateTime .',
-    f':inspect_outliers prov:qualifiedAssociation :{insp_outliers_uuid_executor} .',
-    f':{insp_outliers_uuid_executor} prov:agent :{student_a} .',
-    f':{insp_outliers_uuid_executor} rdf:type prov:Association .',
-    f':{insp_outliers_uuid_executor} prov:hadRole :{code_executor_role} .',
-    ':inspect_outliers prov:used :outliers_report .',
-    ':decision_keep_outliers rdf:type prov:Entity .',
-    ':decision_keep_outliers rdfs:comment "Decision: Retain outliers as they may represent valid extreme cases in credit risk assessment" .',
-    ':decision_keep_outliers prov:wasGeneratedBy :inspect_outliers .',
-]
-all_provenance_triples.extend(inspect_outliers_activity)
+inspect_outliers_activity = inspect_activity_triples(
+    "inspect_outliers", "Inspect outlier detection results",
+    outlier_interpretation,
+    start_time_outliers, end_time_outliers, insp_outliers_uuid_executor, "outliers_report",
+    decision="decision_keep_outliers", decision_comment="Decision: Retain outliers as they may represent valid extreme cases in credit risk assessment",
+)
+emit_triples(inspect_outliers_activity)
 
 #############################################
 # 6) CORRELATION ANALYSIS
@@ -494,24 +560,23 @@ print("\n" + "=" * 80)
 print("6. CORRELATION ANALYSIS")
 print("=" * 80)
 
-def analyze_correlations(df):
-    """Analyze correlations between numerical features"""
-    numerical_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-    
+def analyze_correlations(numerical_cols, values):
+    """Analyze correlations between numerical features (values: rows x numerical_cols matrix)"""
     if len(numerical_cols) > 1:
-        corr_matrix = df[numerical_cols].corr()
+        corr_matrix = np.corrcoef(values, rowvar=False, dtype=np.float64)
         
-        # Find high correlations
-        high_corr = []
-        for i in range(len(corr_matrix.columns)):
-            for j in range(i+1, len(corr_matrix.columns)):
-                corr_value = corr_matrix.iloc[i, j]
-                if abs(corr_value) > 0.5:
-                    high_corr.append({
-                        'feature1': corr_matrix.columns[i],
-                        'feature2': corr_matrix.columns[j],
-                        'correlation': float(corr_value)
-                    })
+        # Find high correlations (upper triangle, row-major order like a pairwise loop)
+        rows, cols = np.triu_indices_from(corr_matrix, k=1)
+        corr_values = corr_matrix[rows, cols]
+        high = np.abs(corr_values) > 0.5
+        high_corr = [
+            {
+                'feature1': numerical_cols[i],
+                'feature2': numerical_cols[j],
+                'correlation': float(corr_value)
+            }
+            for i, j, corr_value in zip(rows[high], cols[high], corr_values[high])
+        ]
         
         return {
             "high_correlations": high_corr,
@@ -521,59 +586,36 @@ def analyze_correlations(df):
         return {"high_correlations": [], "correlation_count": 0}
 
 start_time_corr = now()
-corr_report = analyze_correlations(df)
+corr_report = analyze_correlations(numerical_cols, numerical_values)
 print(f"High correlations (|r| > 0.5): {corr_report['correlation_count']}")
 for corr in corr_report['high_correlations']:
     print(f"  {corr['feature1']} <-> {corr['feature2']}: r={corr['correlation']:.3f}")
 end_time_corr = now()
 
 # Activity: Analyze correlations
-check_corr_uuid_executor = "a3b4c5d6-e7f8-4a9b-0c1d-2e3f4a5b6c7d"
-check_corr_uuid_writer = "b4c5d6e7-f8a9-4b0c-1d2e-3f4a5b6c7d8e"
-
-check_corr_activity = [
-    ':check_correlations rdf:type prov:Activity .',
-    ':check_correlations sc:isPartOf :data_analysis_phase .',
-    ':check_correlations rdfs:comment "Analyze feature correlations" .',
-    ':check_correlations rdfs:comment "Compute pairwise correlations between numerical features to identify redundant or highly related features." .',
-    f':check_correlations prov:startedAtTime "{start_time_corr}"^^xsd:dateTime .',
-    f':check_correlations prov:endedAtTime "{end_time_corr}"^^xsd:dateTime .',
-    f':check_correlations prov:qualifiedAssociation :{check_corr_uuid_executor} .',
-    f':{check_corr_uuid_executor} prov:agent :{executed_by} .',
-    f':{check_corr_uuid_executor} rdf:type prov:Association .',
-    f':{check_corr_uuid_executor} prov:hadRole :{code_executor_role} .',
-    f':check_correlations prov:qualifiedAssociation :{check_corr_uuid_writer} .',
-    f':{check_corr_uuid_writer} prov:agent :{student_a} .',
-    f':{check_corr_uuid_writer} rdf:type prov:Association .',
-    f':{check_corr_uuid_writer} prov:hadRole :{code_writer_role} .',
-    ':check_correlations prov:used :raw_data .',
-    ':correlations_report rdf:type prov:Entity .',
-    f':correlations_report rdfs:comment "Found {corr_report["correlation_count"]} high correlations (|r| > 0.5) between numerical features" .',
-    ':correlations_report prov:wasGeneratedBy :check_correlations .',
-]
-all_provenance_triples.extend(check_corr_activity)
+check_corr_uuid_executor = activity_uuid("check_corr_executor")
+check_corr_uuid_writer = activity_uuid("check_corr_writer")
+
+check_corr_activity = check_activity_triples(
+    "check_correlations", "Analyze feature correlations",
+    "Compute pairwise correlations between numerical features to identify redundant or highly related features.",
+    start_time_corr, end_time_corr, check_corr_uuid_executor, check_corr_uuid_writer,
+    "correlations_report", f'Found {corr_report["correlation_count"]} high correlations (|r| > 0.5) between numerical features',
+)
+emit_triples(check_corr_activity)
 
 # Inspect correlations
-insp_corr_uuid_executor = "c5d6e7f8-a9b0-4c1d-2e3f-4a5b6c7d8e9f"
+insp_corr_uuid_executor = activity_uuid("insp_corr_executor")
 
 corr_interpretation = f"Found {corr_report['correlation_count']} high correlations. For SOM analysis, we retain all features as SOMs can handle correlated features and the visualization may reveal interesting relationships. Feature reduction would be considered only if computational constraints arise."
 
-inspect_corr_activity = [
-    ':inspect_correlations rdf:type prov:Activity .',
-    ':inspect_correlations rdfs:comment "Inspect correlation analysis results" .',
-    f':inspect_correlations rdfs:comment "{corr_interpretation}" .',
-    f':inspect_correlations prov:startedAtTime "{start_time_corr}"^^xsd:dateTime .',
-    f':inspect_correlations prov:endedAtTime "{end_time_corr}"^^xsd:dateTime .',
-    f':inspect_correlations prov:qualifiedAssociation :{insp_corr_uuid_executor} .',
-    f':{insp_corr_uuid_executor} prov:agent :{student_a} .',
-    f':{insp_corr_uuid_executor} rdf:type prov:Association .',
-    f':{insp_corr_uuid_executor} prov:hadRole :{code_executor_role} .',
-    ':inspect_correlations prov:used :correlations_report .',
-    ':decision_keep_all_features rdf:type prov:Entity .',
-    ':decision_keep_all_features rdfs:comment "Decision: Retain all features for SOM training as SOMs can visualize feature relationships effectively" .',
-    ':decision_keep_all_features prov:wasGeneratedBy :inspect_correlations .',
-]
-all_provenance_triples.extend(inspect_corr_activity)
+inspect_corr_activity = inspect_activity_triples(
+    "inspect_correlations", "Inspect correlation analysis results",
+    corr_interpretation,
+    start_time_corr, end_time_corr, insp_corr_uuid_executor, "correlations_report",
+    decision="decision_keep_all_features", decision_comment="Decision: Retain all features for SOM training as SOMs can visualize feature relationships effectively",
+)
+emit_triples(inspect_corr_activity)
 
 #############################################
 # 7) CLASS DISTRIBUTION ANALYSIS
@@ -585,13 +627,22 @@ print("=" * 80)
 def analyze_class_distribution(df):
     """Analyze target class distribution"""
     if 'class' in df.columns:
-        class_counts = df['class'].value_counts()
+        # Count directly on the categorical codes (missing values are coded -1 and skipped)
+        classes = df['class'].astype('category')
+        codes = classes.cat.codes.to_numpy()
+        class_counts = np.bincount(codes[codes >= 0], minlength=len(classes.cat.categories))
+        # Most frequent class first (same order as value_counts)
+        order = np.argsort(-class_counts, kind='stable')
+        names = classes.cat.categories[order].tolist()
+        class_counts = class_counts[order]
         class_pcts = (class_counts / len(df)) * 100
-        imbalance_ratio = class_counts.max() / class_counts.min()
+        # Counts are sorted, so majority/minority are the ends (a class without samples counts as 1,
+        # instead of dividing by zero)
+        imbalance_ratio = class_counts[0] / max(class_counts[-1], 1)
         
         return {
-            "classes": {cls: int(count) for cls, count in class_counts.items()},
-            "percentages": {cls: float(pct) for cls, pct in class_pcts.items()},
+            "classes": dict(zip(names, class_counts.tolist())),
+            "percentages": dict(zip(names, class_pcts.tolist())),
             "imbalance_ratio": float(imbalance_ratio),
             "is_imbalanced": bool(imbalance_ratio > 1.5)
         }
@@ -607,52 +658,29 @@ if class_report:
 end_time_class = now()
 
 # Activity: Analyze class distribution
-check_class_uuid_executor = "d6e7f8a9-b0c1-4d2e-3f4a-5b6c7d8e9f0a"
-check_class_uuid_writer = "e7f8a9b0-c1d2-4e3f-4a5b-6c7d8e9f0a1b"
-
-check_class_activity = [
-    ':check_class_distribution rdf:type prov:Activity .',
-    ':check_class_distribution sc:isPartOf :data_analysis_phase .',
-    ':check_class_distribution rdfs:comment "Analyze target class distribution" .',
-    ':check_class_distribution rdfs:comment "Examine the balance between good and bad credit risk classes to identify potential class imbalance issues." .',
-    f':check_class_distribution prov:startedAtTime "{start_time_class}"^^xsd:dateTime .',
-    f':check_class_distribution prov:endedAtTime "{end_time_class}"^^xsd:dateTime .',
-    f':check_class_distribution prov:qualifiedAssociation :{check_class_uuid_executor} .',
-    f':{check_class_uuid_executor} prov:agent :{executed_by} .',
-    f':{check_class_uuid_executor} rdf:type prov:Association .',
-    f':{check_class_uuid_executor} prov:hadRole :{code_executor_role} .',
-    f':check_class_distribution prov:qualifiedAssociation :{check_class_uuid_writer} .',
-    f':{check_class_uuid_writer} prov:agent :{student_a} .',
-    f':{check_class_uuid_writer} rdf:type prov:Association .',
-    f':{check_class_uuid_writer} prov:hadRole :{code_writer_role} .',
-    ':check_class_distribution prov:used :raw_data .',
-    ':class_distribution_report rdf:type prov:Entity .',
-    f':class_distribution_report rdfs:comment "Class imbalance ratio: {class_report["imbalance_ratio"]:.2f}:1" .',
-    ':class_distribution_report prov:wasGeneratedBy :check_class_distribution .',
-]
-all_provenance_triples.extend(check_class_activity)
+check_class_uuid_executor = activity_uuid("check_class_executor")
+check_class_uuid_writer = activity_uuid("check_class_writer")
+
+check_class_activity = check_activity_triples(
+    "check_class_distribution", "Analyze target class distribution",
+    "Examine the balance between good and bad credit risk classes to identify potential class imbalance issues.",
+    start_time_class, end_time_class, check_class_uuid_executor, check_class_uuid_writer,
+    "class_distribution_report", f'Class imbalance ratio: {class_report["imbalance_ratio"]:.2f}:1',
+)
+emit_triples(check_class_activity)
 
 # Inspect class distribution
-insp_class_uuid_executor = "f8a9b0c1-d2e3-4f4a-5b6c-7d8e9f0a1b2c"
+insp_class_uuid_executor = activity_uuid("insp_class_executor")
 
 class_interpretation = f"Dataset shows class imbalance with ratio {class_report['imbalance_ratio']:.2f}:1. The majority class (good credit) represents about {max(class_report['percentages'].values()):.1f}% of samples. For SOM analysis, this imbalance will be visible in class distribution visualizations and may affect cluster purity."
 
-inspect_class_activity = [
-    ':inspect_class_distribution rdf:type prov:Activity .',
-    ':inspect_class_distribution rdfs:comment "Inspect class distribution" .',
-    f':inspect_class_distribution rdfs:comment "{class_interpretation}" .',
-    f':inspect_class_distribution prov:startedAtTime "{start_time_class}"^^xsd:dateTime .',
-    f':inspect_class_distribution prov:endedAtTime "{end_time_class}"^^xsd:dateTime .',
-    f':inspect_class_distribution prov:qualifiedAssociation :{insp_class_uuid_executor} .',
-    f':{insp_class_uuid_executor} prov:agent :{student_a} .',
-    f':{insp_class_uuid_executor} rdf:type prov:Association .',
-    f':{insp_class_uuid_executor} prov:hadRole :{code_executor_role} .',
-    ':inspect_class_distribution prov:used :class_distribution_report .',
-    ':hypothesis_cluster_structure rdf:type prov:Entity .',
-    ':hypothesis_cluster_structure rdfs:comment "Hypothesis: Expect to see majority class dominating most SOM units with minority class potentially forming smaller, more concentrated clusters. Class overlap may indicate inherent difficulty in credit risk prediction." .',
-    ':hypothesis_cluster_structure prov:wasGeneratedBy :inspect_class_distribution .',
-]
-all_provenance_triples.extend(inspect_class_activity)
+inspect_class_activity = inspect_activity_triples(
+    "inspect_class_distribution", "Inspect class distribution",
+    class_interpretation,
+    start_time_class, end_time_class, insp_class_uuid_executor, "class_distribution_report",
+    decision="hypothesis_cluster_structure", decision_comment="Hypothesis: Expect to see majority class dominating most SOM units with minority class potentially forming smaller, more concentrated clusters. Class overlap may indicate inherent difficulty in credit risk prediction.",
+)
+emit_triples(inspect_class_activity)
 
 #############################################
 # 8) HYPOTHESES (Added as simple PROV-O comments)
@@ -661,20 +689,28 @@ print("\n" + "=" * 80)
 print("8. HYPOTHESES (for SOM exploration)")
 print("=" * 80)
 
+# Timestamps are taken once around the hypothesis computation, like the other sections
+hyp_start = now()
+
 # Compute lightweight summaries to ground hypotheses
-numerical_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-skew_vals = df[numerical_cols].skew(numeric_only=True)
-right_skewed = [col for col, v in skew_vals.items() if v > 0.5]
-left_skewed = [col for col, v in skew_vals.items() if v < -0.5]
+# Sample skewness of all numerical columns in one pass (bias-adjusted like DataFrame.skew; 0 for constant columns)
+counts = np.count_nonzero(~np.isnan(numerical_values), axis=0)
+deviations = numerical_values - np.nanmean(numerical_values, axis=0, dtype=np.float64)
+m2 = np.nansum(deviations ** 2, axis=0) / counts
+m3 = np.nansum(deviations ** 3, axis=0) / counts
+skew_vals = np.divide(m3, m2 ** 1.5, out=np.zeros_like(m2), where=m2 > 0) * np.sqrt(counts * (counts - 1)) / (counts - 2)
+# Indices of the skewed columns; only the first five names are ever spelled out
+right_skewed = np.flatnonzero(skew_vals > 0.5)
+left_skewed = np.flatnonzero(skew_vals < -0.5)
 
 distribution_hypothesis_parts = []
-if right_skewed:
+if len(right_skewed):
     distribution_hypothesis_parts.append(
-        f"Right-skew likely in {', '.join(right_skewed[:5])}{' and others' if len(right_skewed) > 5 else ''}."
+        f"Right-skew likely in {', '.join(numerical_cols[i] for i in right_skewed[:5])}{' and others' if len(right_skewed) > 5 else ''}."
     )
-if left_skewed:
+if len(left_skewed):
     distribution_hypothesis_parts.append(
-        f"Left-skew present in {', '.join(left_skewed[:5])}{' and others' if len(left_skewed) > 5 else ''}."
+        f"Left-skew present in {', '.join(numerical_cols[i] for i in left_skewed[:5])}{' and others' if len(left_skewed) > 5 else ''}."
     )
 if outliers_report and len(outliers_report) > 0:
     distribution_hypothesis_parts.append(
@@ -695,8 +731,8 @@ if corr_report and corr_report.get("correlation_count", 0) > 0:
 
 # Majority/minority classes hypothesis
 if class_report:
-    maj_pct = max(class_report['percentages'].values())
-    min_pct = min(class_report['percentages'].values())
+    class_pcts = np.fromiter(class_report['percentages'].values(), dtype=np.float64)
+    maj_pct, min_pct = class_pcts.max(), class_pcts.min()
     class_balance_hypothesis = (
         f"Class imbalance likely manifests as majority-class dominance across most SOM units "
         f"(~{maj_pct:.1f}% vs. ~{min_pct:.1f}%). Minority class may form smaller, more concentrated regions "
@@ -707,6 +743,8 @@ else:
         "Class labels unavailable; cluster composition will be inferred solely from feature distributions."
     )
 
+hyp_end = now()
+
 # Print hypotheses to console
 print("- Data distribution:")
 print(f"  {distribution_hypothesis}")
@@ -716,30 +754,11 @@ print("- Majority/minority:")
 print(f"  {class_balance_hypothesis}")
 
 # Record hypotheses in PROV-O as simple comments
-hyp_start = now()
-hyp_end = now()
-hypotheses_activity = [
-    ':formulate_hypotheses rdf:type prov:Activity .',
-    ':formulate_hypotheses sc:isPartOf :data_analysis_phase .',
-    ':formulate_hypotheses rdfs:label "Formulate Hypotheses" .',
-    ':formulate_hypotheses rdfs:comment "High-level hypotheses to guide SOM exploration" .',
-    f':formulate_hypotheses prov:startedAtTime "{hyp_start}"^^xsd:dateTime .',
-    f':formulate_hypotheses prov:endedAtTime "{hyp_end}"^^xsd:dateTime .',
-    ':formulate_hypotheses prov:used :value_ranges_report .',
-    ':formulate_hypotheses prov:used :outliers_report .',
-    ':formulate_hypotheses prov:used :correlations_report .',
-    ':formulate_hypotheses prov:used :class_distribution_report .',
-    ':hypothesis_data_distribution rdf:type prov:Entity .',
-    f':hypothesis_data_distribution rdfs:comment "{distribution_hypothesis}" .',
-    ':hypothesis_data_distribution prov:wasGeneratedBy :formulate_hypotheses .',
-    ':hypothesis_cluster_structure_simple rdf:type prov:Entity .',
-    f':hypothesis_cluster_structure_simple rdfs:comment "{cluster_rel_hypothesis}" .',
-    ':hypothesis_cluster_structure_simple prov:wasGeneratedBy :formulate_hypotheses .',
-    ':hypothesis_class_balance rdf:type prov:Entity .',
-    f':hypothesis_class_balance rdfs:comment "{class_balance_hypothesis}" .',
-    ':hypothesis_class_balance prov:wasGeneratedBy :formulate_hypotheses .',
-]
-all_provenance_triples.extend(hypotheses_activity)
+hypotheses_activity = HYPOTHESES_TEMPLATE.format(
+    start=hyp_start, end=hyp_end, distribution=distribution_hypothesis,
+    cluster_structure=cluster_rel_hypothesis, class_balance=class_balance_hypothesis,
+)
+emit_triples(hypotheses_activity)
 
 #############################################
 # SAVE RESULTS
@@ -759,18 +778,18 @@ all_reports = {
     "class_distribution": class_report
 }
 
-with open('data/analysis_reports.json', 'w') as f:
-    json.dump(all_reports, f, indent=2)
+# Serialize in one go with orjson (same layout as json.dumps(indent=2)) and write the blob at once
+with open('data/analysis_reports.json', 'wb') as f:
+    f.write(orjson.dumps(all_reports, option=orjson.OPT_INDENT_2))
 print("✓ Saved analysis reports to data/analysis_reports.json")
 
 # Save provenance triples
-with open('data/analysis_provenance_triples.txt', 'w') as f:
-    for triple in all_provenance_triples:
-        f.write(triple + '\n')
-print(f"✓ Saved {len(all_provenance_triples)} provenance triples to data/analysis_provenance_triples.txt")
+triples_out.close()
+os.replace(TRIPLES_FILE + '.tmp', TRIPLES_FILE)
+print(f"✓ Saved {num_provenance_triples} provenance triples to {TRIPLES_FILE}")
 
 print("\n" + "=" * 80)
 print("ANALYSIS COMPLETE")
 print("=" * 80)
-print(f"\nGenerated {len(all_provenance_triples)} PROV-O triples documenting the analysis workflow")
+print(f"\nGenerated {num_provenance_triples} PROV-O triples documenting the analysis workflow")
 print("All triples are ready to be inserted into the triple store using engine.insert()")
@@ -3,7 +3,7 @@ German Credit Dataset Description in RDF Triples
 Using PROV-O, Croissant, and Schema.org vocabularies
 """
 
-data_description_triples = [
+data_description_triples = (
     # Dataset Entity (Core Information)
     ':raw_data rdf:type prov:Entity .',
     ':raw_data rdf:type sc:Dataset .',
@@ -237,17 +237,10 @@ data_description_triples = [
     ':field-class sc:description "Target classification: good or bad credit risk" .',
     ':field-class cr:dataType sc:Text .',
     ':field-class cr:source :credit-g-arff .',
-    
-    # File Object - ARFF Distribution
-    ':credit-g-arff rdf:type cr:FileObject .',
-    ':credit-g-arff rdf:type prov:Entity .',
-    ':credit-g-arff rdf:type sc:DataDownload .',
-    ':credit-g-arff sc:name "credit-g.arff" .',
-    ':credit-g-arff sc:description "Local ARFF format distribution of the German Credit dataset" .',
-    ':credit-g-arff sc:encodingFormat "text/arff" .',
-    ':credit-g-arff cr:format "ARFF" .',
-    ':credit-g-arff prov:wasDerivedFrom :raw_data .',
-]
+)
+
+# All triples as one newline-joined block (e.g. for writing them to a file in one go)
+DATA_DESCRIPTION_TEXT = "\n".join(data_description_triples)
 
 # Usage example:
-# engine.insert(data_description_triples, prefixes=prefixes)
+# engine.insert(list(data_description_triples), prefixes=prefixes)